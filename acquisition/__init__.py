@@ -0,0 +1,11 @@
+"""
+Recording earthquakes off the shake table, from any sample source.
+    sources.py  where readings come from: the MCP3008 over GPIO or SPI,
+                a replayed CSV, or a synthetic signal
+    loop.py     run_until_threshold / record_data / monitor, the one
+                sampling loop every source goes through
+    cli.py      the command line, python -m acquisition --help
+The building blocks (adc, scheduler, trigger, recording, ...) are the
+top-level modules next to this package.
+"""
+from acquisition.sources import SOURCES, AdcSource, SyntheticSource, open_source
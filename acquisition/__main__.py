@@ -0,0 +1,3 @@
+from acquisition.cli import main
+
+main()
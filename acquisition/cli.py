@@ -0,0 +1,208 @@
+"""
+Command line for the acquisition loop:  python -m acquisition --help
+record_data.py and friends call main() with their old defaults.
+"""
+import argparse
+import os
+
+from adc import ADC_BACKENDS
+from baseline import BaselineTracker
+from displacement import LiveDisplacement
+from instrument import Instruments
+from plotting import EventTrace, PlotWorker
+from scheduler import SampleScheduler
+from spectrum import SpectralMonitor
+from trigger import StaLtaTrigger, ThresholdTrigger, AnyChannelTrigger, MagnitudeTrigger, TRIGGERS, CHANNEL_MODES
+
+from acquisition.loop import new_buffer, establish_baseline, run_until_threshold, record_data, monitor
+from acquisition.sources import SOURCES, open_source
+from acquisition.synthetic import SHAPES
+
+REPLAY_FILE_NAME = "saved_CSVs/pulse_elastic.csv"
+
+def make_trigger(args, baseline, tolerance, end_tolerance):
+    if args['trigger'] == 'threshold':
+        return ThresholdTrigger(baseline, tolerance, end_tolerance, args['sigmas'])
+    return StaLtaTrigger(baseline, args['sta'], args['lta'], args['on'], args['off'])
+
+def main(argv=None, source='gpio', plot=True):
+    """
+    source and plot are the defaults for --source and for drawing each
+    recording, so the old scripts keep behaving the way they did.
+    """
+    # ~~~~~~~ OPTIONS TO CONFIGURE ~~~~~~~~~
+    num_before_threshold = 20
+    tolerance = 5
+    end_tolerance = 5
+    save_file_name =  "saved_CSVs/our_data.csv"
+    max_time = float("inf")
+    num_measurements = float("inf")
+    channels = [0]
+    # ~~~~~~~ ==================== ~~~~~~~~~
+    parser = argparse.ArgumentParser(description='Records data from an ADC, a replayed recording or a synthetic signal')
+    parser.add_argument('-S','--source', help='Where readings come from: "gpio" (MCP3008 on pins 18/23/24/25), "spi" (MCP3008 on the hardware SPI pins, much faster), "replay" (a saved CSV, see --replay) or "synthetic" (noise with a made-up event every so often, see the synthetic options). Default "'+source+'".', choices=SOURCES, default=source)
+    parser.add_argument('-a','--adc', help='Same as --source gpio (bitbang) or --source spi, for old command lines.', choices=ADC_BACKENDS, required=False)
+    parser.add_argument('-b','--before', help='Number of samples that will be saved from just before we hit the threshold.', required=False)
+    parser.add_argument('-B','--beforetime', help='Seconds of samples to keep from before we hit the threshold. Overrides --before, needs a --rate.', required=False)
+    parser.add_argument('-n','--num', help='Number of samples that will be saved. Defaults to infinity.', required=False)
+    parser.add_argument('-T','--trigger', help='How to detect an earthquake: "stalta" (default, short/long term average ratio) or "threshold" (any reading more than TOLERANCE off the mean).', choices=TRIGGERS, default='stalta')
+    parser.add_argument('--sta', help='STA/LTA short window, in samples. Default 50.', type=int, default=50)
+    parser.add_argument('--lta', help='STA/LTA long window, in samples. Default 1000.', type=int, default=1000)
+    parser.add_argument('--on', help='STA/LTA ratio that starts a recording. Default 4.', type=float, default=4.0)
+    parser.add_argument('--off', help='STA/LTA ratio that ends a recording. Default 1.5.', type=float, default=1.5)
+    parser.add_argument('-t','--tolerance', help='Threshold trigger: the amount that the table needs to shake before recording will start.', required=False)
+    parser.add_argument('-k','--sigmas', help='Threshold trigger: give the tolerance in standard deviations of the baseline instead of counts.', type=float, required=False)
+    parser.add_argument('-w','--baselinewindow', help='Roughly how many samples the running baseline averages over. Default 5000.', type=int, default=5000)
+    parser.add_argument('-z','--rate', help='Samples per second to record at. Defaults to 500, or as fast as possible for a replay.', required=False)
+    parser.add_argument('-s','--sleeptime', help='Time between measurements in seconds, same as --rate 1/SLEEPTIME.', required=False)
+    parser.add_argument('-f','--filename', help='Filename to save to. Looks like "saved_CSVs/<FILENAME>.csv"', required=False)
+    parser.add_argument('--binary', help='Save in the binary recording format (see recording.py) as .bin instead of .csv.', action='store_true')
+    parser.add_argument('-m','--maxtime', help='Upper limit on the recording time. Starts *after* you hit threshold. Default time infinity.', required=False)
+    parser.add_argument('-e','--endtolerance', help='Threshold trigger: stops recording after ENDTOLERANCE measurements in a row change less than TOLERANCE.', required=False)
+    parser.add_argument('-c','--channels', help='Comma separated MCP3008 channels to record, e.g. "0,1,2" for three axes. Default 0.', required=False)
+    parser.add_argument('-M','--channelmode', help='Several channels: trigger when "any" channel does (default), or on the "magnitude" of all of them together.', choices=CHANNEL_MODES, default='any')
+    parser.add_argument('-d','--daemon', help='Keep monitoring after each event, saving every event to its own timestamped file next to --filename.', action='store_true')
+    parser.add_argument('--events', help='Daemon mode: stop after this many events. Default no limit.', type=int, required=False)
+    parser.add_argument('--plot', help='Draw each recording to a .png next to it.'+(' (default)' if plot else ''), dest='plot', action='store_true', default=plot)
+    parser.add_argument('--noplot', help='Don\'t draw the recordings.'+('' if plot else ' (default)'), dest='plot', action='store_false')
+    parser.add_argument('-p','--plotpoints', help='Most points to draw per line; longer events are cut down by min/max decimation. 0 draws every sample. Default 20000.', type=int, default=20000)
+    parser.add_argument('--fsync', help='Seconds between forcing the recording out to the card while recording, 0 for after every write. Default 1.', type=float, default=1.0)
+    parser.add_argument('--spectrum', help='Work out the dominant frequency and the filter band while recording, and print them every second.', action='store_true')
+    parser.add_argument('--maxfreq', help='Spectrum: highest frequency to look at, in Hz. Default 25.', type=float, default=25.0)
+    parser.add_argument('--window', help='Spectrum: seconds of signal it covers. Default 4.', type=float, default=4.0)
+    parser.add_argument('--displacement', help='Integrate the acceleration to displacement while recording, like process.py does afterwards, and print it every second.', action='store_true')
+    parser.add_argument('--band', help='Displacement: bandpass "LOW,HIGH" in Hz applied before each integration. Default "1,25".', default='1,25')
+    parser.add_argument('--stats', help='Time every stage of the loop and write the timings to this JSON file at the end, and whenever the process gets SIGUSR1.', required=False)
+    parser.add_argument('-r','--replay', help='CSV recording to play back with --source replay. Defaults to "'+REPLAY_FILE_NAME+'"', default=REPLAY_FILE_NAME)
+    parser.add_argument('--realtime', help='Replay at the recorded sample rate instead of as fast as possible.', action='store_true')
+    synthetic = parser.add_argument_group('synthetic source', 'Shape of the signal made up by --source synthetic, see acquisition/synthetic.py.')
+    synthetic.add_argument('--shape', help='"sine" (default), "pulse" or "noise".', choices=SHAPES, default='sine')
+    synthetic.add_argument('--amplitude', help='Event amplitude in ADC counts. Default 80.', type=float, default=80.0)
+    synthetic.add_argument('--frequency', help='Event frequency in Hz. Default 5.', type=float, default=5.0)
+    synthetic.add_argument('--duration', help='Event length in seconds. Default 1.', type=float, default=1.0)
+    synthetic.add_argument('--every', help='Seconds from one event to the next. Default 10.', type=float, default=10.0)
+    synthetic.add_argument('--noise', help='Standard deviation of the background noise, in counts. Default 1.', type=float, default=1.0)
+    args = vars(parser.parse_args(argv))
+    if args['adc']:
+        args['source'] = 'gpio' if args['adc'] == 'bitbang' else 'spi'
+    sample_rate = None if args['source'] == 'replay' else 500.0 # samples/second
+    if args['before']:
+        num_before_threshold = int(args['before'])
+    if args['num']:
+        num_measurements = int(args['num'])
+    if args['tolerance']:
+        tolerance = float(args['tolerance'])
+    if args['rate']:
+        sample_rate = float(args['rate'])
+    if args['sleeptime']:
+        sample_rate = 1.0/float(args['sleeptime'])
+    if args['filename']:
+        save_file_name =  "saved_CSVs/"+args['filename']+".csv"
+    if args['binary']:
+        save_file_name = os.path.splitext(save_file_name)[0]+".bin"
+    if args['maxtime']:
+        max_time = float(args['maxtime'])
+    if args['endtolerance']:
+        end_tolerance = float(args['endtolerance'])
+    if args['beforetime']:
+        if not sample_rate:
+            parser.error('--beforetime needs a sample --rate')
+        num_before_threshold = int(float(args['beforetime'])*sample_rate)
+    if args['channels']:
+        channels = [int(c) for c in args['channels'].split(',')]
+        if len(set(channels)) != len(channels) or not all(0 <= c <= 7 for c in channels):
+            parser.error('--channels must be different numbers from 0 thru 7')
+    if args['spectrum'] and not sample_rate:
+        parser.error('--spectrum needs a sample --rate')
+    if args['displacement'] and not sample_rate:
+        parser.error('--displacement needs a sample --rate')
+    band = [float(f) for f in args['band'].split(',')]
+    if len(band) != 2 or not 0 < band[0] < band[1]:
+        parser.error('--band must be "LOW,HIGH" with 0 < LOW < HIGH')
+    if args['source'] == 'replay' and channels != [0]:
+        parser.error('--source replay only has one channel')
+    # ~~~~~~~ ==================== ~~~~~~~~~
+    signal = dict((k, args[k]) for k in ('shape', 'amplitude', 'frequency', 'duration', 'every', 'noise'))
+    source = open_source(args['source'], channels, args['replay'], args['realtime'], sample_rate, signal)
+    scheduler = SampleScheduler(sample_rate)
+    instruments = None
+    if args['stats']:
+        instruments = Instruments()
+        instruments.install_signal(args['stats'])
+    magnitude_baseline = BaselineTracker(args['baselinewindow']) if len(channels) > 1 and args['channelmode'] == 'magnitude' else None
+    baseline = establish_baseline(source, 100, args['baselinewindow'], magnitude_baseline)
+    if len(channels) == 1:
+        trigger = make_trigger(args, baseline, tolerance, end_tolerance)
+        baselines = [baseline]
+    elif args['channelmode'] == 'magnitude':
+        trigger = MagnitudeTrigger(baseline, make_trigger(args, magnitude_baseline, tolerance, end_tolerance))
+        baselines = baseline
+    else:
+        trigger = AnyChannelTrigger(make_trigger(args, b, tolerance, end_tolerance) for b in baseline)
+        baselines = baseline
+    buffer_before_threshold = new_buffer(source, num_before_threshold) # kept between events
+    spectrum = SpectralMonitor(sample_rate, len(channels), args['window'], args['maxfreq']) if args['spectrum'] else None
+    displacement = LiveDisplacement(sample_rate, band[0], band[1], len(channels)) if args['displacement'] else None
+    plotter = PlotWorker(args['plotpoints'], labels=["ch "+str(c) for c in channels] if len(channels) > 1 else None) if args['plot'] else None
+    if args['daemon']:
+        events = monitor(source, buffer_before_threshold, trigger, scheduler, save_file_name, num_measurements, max_time,
+                         args['events'] or float("inf"), plotter, instruments, args['fsync'], spectrum, displacement)
+        print("\nMonitoring Stopped.")
+        print("  Events Recorded : "+str(events))
+        scheduler.print_stats()
+        if instruments is not None:
+            instruments.print_stats()
+            instruments.dump(args['stats'])
+        if plotter is not None:
+            plotter.close() # finish the plots still queued
+        source.close()
+        return
+    # Run until earthquake detected
+    try:
+        run_until_threshold(source, buffer_before_threshold, trigger, scheduler, instruments)
+    except EOFError:
+        print("The "+args['source']+" source ran out before the threshold was met.")
+        source.close()
+        return
+    mean = trigger.mean # frozen by the trigger until the event is over
+    for channel, b in zip(channels, baselines):
+        print("Baseline ch "+str(channel)+"    : "+str(b.mean)+" +/- "+str(b.std)+" over "+str(b.count)+" samples")
+    trace = EventTrace(len(channels)) if plotter is not None else None
+    # Saves what led up to the earthquake, then runs from its start until end as defined by end_tolerance
+    time_taken, actual_num_measurements, interrupted, writer_stats = record_data(source, num_measurements, trigger, scheduler, save_file_name, max_time, mean,
+                                                                                 None, trace, instruments, buffer_before_threshold, args['fsync'], spectrum, displacement)
+    # Draw what we just recorded, from memory and in the background
+    if plotter is not None:
+        plotter.submit(trace, os.path.splitext(save_file_name)[0]+".png")
+    # ~~~~~~~   HELPFUL MESSAGES   ~~~~~~~~~
+    print("\nData Recording Complete.")
+    print("  Source          : "+args['source'])
+    print("  Num Measurements: "+str(actual_num_measurements))
+    print("  Time Taken      : "+str(time_taken)+" seconds")
+    print("  Measures/second : "+str(actual_num_measurements/time_taken))
+    if len(channels) > 1:
+        # every row is one conversion per channel, so this is what the ADC actually did
+        print("  Channels        : "+",".join(str(c) for c in channels)+" (trigger on "+args['channelmode']+")")
+        print("  Per channel rate: "+str(actual_num_measurements/time_taken)+" samples/second")
+        print("  Conversions/sec : "+str(len(channels)*actual_num_measurements/time_taken))
+    print("  Saved To        : "+writer_stats["file"])
+    if spectrum is not None and spectrum.band() is not None:
+        low, high = spectrum.band()
+        print("  Dominant freq   : "+str(spectrum.dominant_frequency())+" Hz (filter band "+str(low)+" - "+str(high)+" Hz)")
+    if displacement is not None:
+        print("  Peak disp       : "+", ".join(str(p) for p in displacement.peak())+" ("+args['band']+" Hz band)")
+    if args['trigger'] == 'threshold' and args['sigmas']:
+        print("  Tolerance       : "+str(args['sigmas'])+" sigma ("+str(trigger.active_tolerance)+")")
+        print("  EndTolerance    : "+str(end_tolerance))
+    elif args['trigger'] == 'threshold':
+        print("  Tolerance       : "+str(tolerance))
+        print("  EndTolerance    : "+str(end_tolerance))
+    else:
+        print("  STA/LTA         : "+str(args['sta'])+"/"+str(args['lta'])+" samples, on "+str(args['on'])+", off "+str(args['off']))
+    scheduler.print_stats()
+    if instruments is not None:
+        instruments.print_stats()
+        instruments.dump(args['stats'])
+    source.close()
+    if plotter is not None:
+        plotter.close() # waits for the plot to be saved
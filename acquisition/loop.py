@@ -0,0 +1,245 @@
+"""
+The acquisition loop, the same for every sample source (see sources.py):
+wait for an event with run_until_threshold, record the pre-trigger ring
+and then everything until the trigger lets go with record_data, and in
+daemon mode go round again with monitor.
+Pass an instrument.Instruments as INSTRUMENTS to time each stage of
+the loop: wait, read, buffer, trigger, and while recording row, queue
+and the writer thread's disk writes.
+Samples are stamped with time.perf_counter_ns(); each recording gets a
+recording.ClockAnchor to turn those into wall-clock time as it's written.
+"""
+import itertools
+import os
+import time
+from datetime import datetime
+
+from baseline import BaselineTracker
+from instrument import timed
+from pipeline import BufferedWriter
+from plotting import EventTrace
+from recording import ClockAnchor, open_recording, row_builder
+from ringbuffer import SampleRing, MultiSampleRing
+from trigger import magnitude
+
+# ~~~~~~~ Helpers related to the buffer ~~~~~~~~~~~~~
+# The pre-trigger buffer is a ringbuffer.SampleRing of (perf_counter_ns(), raw reading)
+# pairs (a MultiSampleRing with several channels). It's only turned into
+# timestamps when we save it.
+
+def new_buffer(SOURCE, size):
+    if len(SOURCE.channels) > 1:
+        return MultiSampleRing(size, len(SOURCE.channels), SOURCE.typecode)
+    return SampleRing(size, SOURCE.typecode)
+
+def write_buffer(my_buffer, recording, MEAN, TRACE=None, CHUNK=10000):
+    """
+    Writes the buffered samples, oldest first, to recording (see
+    recording.py) as (time, value - MEAN, ...) rows, CHUNK rows at a
+    time. MEAN is a number, or one per channel. The rows are also added
+    to TRACE (a plotting.EventTrace) if given. Returns how many rows
+    there were.
+    """
+    make_row = row_builder(MEAN)
+    samples = my_buffer.rows()
+    count = 0
+    while True:
+        rows = [make_row(t, v) for t, v in itertools.islice(samples, CHUNK)]
+        if not rows:
+            return count
+        recording.write_rows(rows)
+        if TRACE is not None:
+            TRACE.extend(rows)
+        count += len(rows)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def establish_baseline(SOURCE, num_samples, window, MAGNITUDE=None):
+    """
+    Starts a BaselineTracker off with num_samples readings. From then on the
+    trigger keeps it up to date while things are quiet.
+    Returns a list of them, one per channel, when SOURCE has several channels.
+    MAGNITUDE, a BaselineTracker for a trigger.MagnitudeTrigger, is then
+    started off with the magnitudes of the same readings.
+    """
+    if len(SOURCE.channels) > 1:
+        baselines = [BaselineTracker(window) for channel in SOURCE.channels]
+        readings = []
+        for i in range(num_samples):
+            values = SOURCE.read()
+            readings.append(values)
+            for baseline, value in zip(baselines, values):
+                baseline.update(value)
+        if MAGNITUDE is not None:
+            # against the settled channel means, like MagnitudeTrigger will
+            for values in readings:
+                MAGNITUDE.update(magnitude(baselines, values))
+        return baselines
+    baseline = BaselineTracker(window)
+    for i in range(num_samples):
+        baseline.update(SOURCE.read())
+    return baseline
+
+def run_until_threshold(SOURCE, BUFFER, TRIGGER, SCHEDULER, INSTRUMENTS=None):
+    """
+    Runs until TRIGGER (see trigger.py) says an event has started
+    Reads are paced by SCHEDULER (see scheduler.py)
+    Every reading goes into BUFFER, the pre-trigger ring from new_buffer().
+    """
+    read = timed(INSTRUMENTS, "read", SOURCE.read)
+    wait = timed(INSTRUMENTS, "wait", SCHEDULER.wait)
+    append = timed(INSTRUMENTS, "buffer", BUFFER.append)
+    update = timed(INSTRUMENTS, "trigger", TRIGGER.update)
+    clock = time.perf_counter_ns
+    while True:
+        wait() # hang out until the next sample is due
+        acc_read = read() # read the analog pin
+        append(clock(), acc_read)
+        if update(acc_read): # is this an earthquake?
+            print("Change threshold met!")
+            return BUFFER
+
+def record_data(SOURCE, NUM_MEASUREMENTS, TRIGGER, SCHEDULER, SAVE_FILE_NAME, MAX_TIME, MEAN, BUFFER=None, TRACE=None, INSTRUMENTS=None,
+                PRE_TRIGGER=None, SYNC_EVERY=1.0, SPECTRUM=None, DISPLACEMENT=None):
+    """
+    Records data to save into <SAVE_FILE_NAME> (.csv or .bin)
+    Starts recording after RUN_UNTIL_THRESHOLD() finishes executing
+    Stops recording once TRIGGER says the event is over, or SOURCE runs out.
+    The file is written through one handle: first the PRE_TRIGGER ring
+    if given, then every live reading, fsynced every SYNC_EVERY seconds.
+    Both are written on the writer thread; the ring is copied first, so
+    sampling starts again straight away.
+    It only appears under SAVE_FILE_NAME once the event is over and all
+    of it is on disk (see recording.py).
+    Readings also go into BUFFER if given, so the pre-trigger ring is
+    current when the next event starts, and rows into TRACE if given.
+    With a SPECTRUM (spectrum.SpectralMonitor) or a DISPLACEMENT
+    (displacement.LiveDisplacement) the live rows also go through them,
+    and their summaries are printed every so often.
+    Returns (seconds taken, measurements, whether Ctrl-C stopped it,
+    the writer's stats()).
+    """
+    recording = open_recording(SAVE_FILE_NAME, "w", SCHEDULER.rate, MEAN, SOURCE.channels,
+                               sync_every=SYNC_EVERY, anchor=ClockAnchor.now())
+    first = None
+    head = None # the pre-trigger rows for TRACE, filled in on the writer thread
+    if PRE_TRIGGER is not None:
+        snapshot = PRE_TRIGGER.snapshot() # before BUFFER moves on
+        if TRACE is not None:
+            head = EventTrace(TRACE.width)
+        first = lambda rec: write_buffer(snapshot, rec, MEAN, head)
+    clock = time.perf_counter_ns
+    start_time = clock()
+    end_time = start_time + MAX_TIME * 1e9 # inf when there's no limit
+    if INSTRUMENTS is not None:
+        recording.write_rows = INSTRUMENTS.wrap("disk", recording.write_rows) # called on the writer thread
+    writer = BufferedWriter(recording, first=first) # written from a background thread
+    make_row = timed(INSTRUMENTS, "row", row_builder(MEAN))
+    read = timed(INSTRUMENTS, "read", SOURCE.read)
+    wait = timed(INSTRUMENTS, "wait", SCHEDULER.wait)
+    put = timed(INSTRUMENTS, "queue", writer.put)
+    update = timed(INSTRUMENTS, "trigger", TRIGGER.update)
+    append = timed(INSTRUMENTS, "buffer", BUFFER.append) if BUFFER is not None else None
+    spectrum = None
+    if SPECTRUM is not None:
+        SPECTRUM.reset() # each event gets a spectrum of its own
+        spectrum = timed(INSTRUMENTS, "spectrum", SPECTRUM.add)
+    displacement = None
+    if DISPLACEMENT is not None:
+        DISPLACEMENT.reset()
+        displacement = timed(INSTRUMENTS, "displacement", DISPLACEMENT.add)
+    i = 0
+    interrupted = False
+    try:
+        while i < NUM_MEASUREMENTS:
+            wait() # hang out until the next sample is due
+            try:
+                acc_read = read() # read the analog pin
+            except EOFError:
+                print("Source ran out at: "+str(i)+" measurements!")
+                break
+            now = clock()
+            row = make_row(now, acc_read)
+            put(row)
+            if TRACE is not None:
+                TRACE.add(row)
+            if spectrum is not None and spectrum(row):
+                print(SPECTRUM.summary())
+            if displacement is not None and displacement(row):
+                print(DISPLACEMENT.summary())
+            if append is not None:
+                append(now, acc_read)
+            i += 1
+            if not update(acc_read):
+                print("End threshold met at: "+str(i)+" measurements!")
+                break
+            if now >= end_time:
+                break
+    except KeyboardInterrupt:
+        print("Stopped by user at: "+str(i)+" measurements!")
+        interrupted = True
+    finally:
+        writer.close() # waits for every queued row to be written
+    if head is not None:
+        TRACE.prepend(head)
+    writer.print_stats()
+    if INSTRUMENTS is not None:
+        INSTRUMENTS.count("rows", i)
+        INSTRUMENTS.count("dropped", writer.dropped)
+    return ((clock() - start_time) / 1e9, i, interrupted, writer.stats())
+
+def event_file_name(SAVE_FILE_NAME):
+    """
+    <name>_<YYYYmmdd_HHMMSS>.<ext> next to SAVE_FILE_NAME, numbered if two
+    events start in the same second, so no event overwrites another.
+    """
+    base, ext = os.path.splitext(SAVE_FILE_NAME)
+    stamped = base+"_"+datetime.now().strftime("%Y%m%d_%H%M%S")
+    fname = stamped+ext
+    n = 1
+    while os.path.exists(fname):
+        n += 1
+        fname = stamped+"_"+str(n)+ext
+    return fname
+
+def monitor(SOURCE, BUFFER, TRIGGER, SCHEDULER, SAVE_FILE_NAME, NUM_MEASUREMENTS, MAX_TIME, MAX_EVENTS, PLOTTER=None, INSTRUMENTS=None,
+            SYNC_EVERY=1.0, SPECTRUM=None, DISPLACEMENT=None):
+    """
+    Daemon mode: records events back to back until MAX_EVENTS have been
+    saved, SOURCE runs out or Ctrl-C, each to its own event_file_name().
+    BUFFER and TRIGGER carry on from one event to the next, nothing is
+    reallocated, and every file is closed when its event ends, so a run
+    can go on for days.
+    An event cut short by NUM_MEASUREMENTS or MAX_TIME carries on in a new file.
+    With a PLOTTER (plotting.PlotWorker) each event is also drawn to a
+    .png next to its recording, in the background.
+    Returns the number of events recorded.
+    """
+    events = 0
+    while events < MAX_EVENTS:
+        try:
+            run_until_threshold(SOURCE, BUFFER, TRIGGER, SCHEDULER, INSTRUMENTS)
+        except KeyboardInterrupt:
+            print("Stopped by user while waiting for an event.")
+            break
+        except EOFError:
+            print("Source ran out while waiting for an event.")
+            break
+        events += 1
+        if INSTRUMENTS is not None:
+            INSTRUMENTS.count("events")
+        event_file = event_file_name(SAVE_FILE_NAME)
+        mean = TRIGGER.mean # frozen by the trigger until the event is over
+        trace = EventTrace(len(SOURCE.channels)) if PLOTTER is not None else None
+        time_taken, num, interrupted, writer_stats = record_data(SOURCE, NUM_MEASUREMENTS, TRIGGER, SCHEDULER, event_file, MAX_TIME, mean,
+                                                                BUFFER, trace, INSTRUMENTS, BUFFER, SYNC_EVERY, SPECTRUM, DISPLACEMENT)
+        if PLOTTER is not None:
+            PLOTTER.submit(trace, os.path.splitext(event_file)[0]+".png")
+        print("Event "+str(events)+": "+str(num)+" measurements in "+str(time_taken)+" seconds, saved to "+writer_stats["file"])
+        if SPECTRUM is not None:
+            print(SPECTRUM.summary())
+        if DISPLACEMENT is not None:
+            print(DISPLACEMENT.summary())
+        if interrupted:
+            break
+    return events
@@ -0,0 +1,109 @@
+"""
+Where the acquisition loop gets its readings. A sample source has
+    channels  list of channel numbers
+    typecode  array typecode that holds one value (for the pre-trigger ring)
+    read()    one reading: a number with one channel, a list of one value
+              per channel with several. Finite sources raise EOFError
+              when they run out.
+    close()
+open_source() makes one by name, which is what --source picks.
+"""
+import time
+
+from adc import open_adc
+from acquisition.synthetic import make_cycle
+
+SOURCES = ("gpio", "spi", "replay", "synthetic")
+
+class AdcSource(object):
+    """
+    The MCP3008 through one of the adc.py backends. read is the
+    backend's own bound method, so the sampling loop doesn't pay for a
+    wrapper call on every reading.
+    """
+    typecode = 'h' # raw counts are 0 thru 1023
+
+    def __init__(self, adc, channels=(0,)):
+        self.adc = adc
+        self.channels = list(channels)
+        if len(self.channels) > 1:
+            channels = self.channels
+            read_channels = adc.read_channels
+            self.read = lambda: read_channels(channels)
+        else:
+            self.read = adc.read
+
+    def close(self):
+        self.adc.close()
+
+class SyntheticSource(object):
+    """
+    A synthetic.make_cycle() signal, repeated forever, on every channel
+    (each with its own noise). Takes the same keyword arguments as
+    make_cycle, see synthetic.py for the shapes.
+        - By default every read() is the next sample, whatever the time.
+        - clocked=True picks the sample from the time since the first
+          read instead, like a real sensor: if the loop falls behind,
+          the samples it didn't read are gone.
+    samples_since_onset() says how far into the current event the last
+    reading was, which is what the load test measures trigger latency with.
+    """
+    typecode = 'd'
+
+    def __init__(self, channels=(0,), rate=500.0, clocked=False, seed=None, **signal):
+        self.channels = list(channels)
+        self.rate = rate
+        self.clocked = clocked
+        self.tables = []
+        for k in range(len(self.channels)):
+            table, self.onset = make_cycle(rate, seed=None if seed is None else seed + k, **signal)
+            self.tables.append(table)
+        self.length = len(self.tables[0])
+        self.index = -1 # of the last sample read
+        self._start = None
+
+    def read(self):
+        if self.clocked:
+            now = time.perf_counter()
+            if self._start is None:
+                self._start = now
+            i = int((now - self._start) * self.rate)
+        else:
+            i = self.index + 1
+        self.index = i
+        i %= self.length
+        if len(self.tables) > 1:
+            return [table[i] for table in self.tables]
+        return self.tables[0][i]
+
+    def samples_since_onset(self):
+        """
+        Negative while the last reading was still before this cycle's event.
+        """
+        return self.index % self.length - self.onset
+
+    def close(self):
+        pass
+
+def open_source(name, channels=(0,), replay_file=None, realtime=False, rate=None, synthetic=None):
+    """
+    Opens the named source.
+        - "gpio" bit-bangs the MCP3008 on pins 18/23/24/25.
+        - "spi" uses the kernel SPI driver, falling back to "gpio" with a
+          warning when there's no SPI device.
+        - "replay" plays back replay_file, paced to the recorded times
+          with realtime, and only has one channel.
+        - "synthetic" is SyntheticSource at rate (500 if None), with the
+          make_cycle keyword arguments in the synthetic dict.
+    """
+    channels = list(channels)
+    if name == "replay":
+        if channels != [0]:
+            raise ValueError("Replays only have one channel")
+        from replay import CsvReplaySource
+        return CsvReplaySource(replay_file, throttle=realtime)
+    if name == "synthetic":
+        return SyntheticSource(channels, rate or 500.0, **(synthetic or {}))
+    if name not in ("gpio", "spi"):
+        raise ValueError("Unknown sample source: " + str(name))
+    return AdcSource(open_adc("spi" if name == "spi" else "bitbang", channels[0]), channels)
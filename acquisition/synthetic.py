@@ -0,0 +1,53 @@
+"""
+Synthetic ground motion, for driving the acquisition loop at any rate
+without the shake table.
+A signal is one precomputed cycle per channel at a fixed sample rate:
+quiet (level plus gaussian noise) for `every` seconds, with an event at
+the end of it. Making a sample is then a table lookup, so even tens of
+kHz cost next to nothing and the load test measures our loop, not the
+generator. The event shapes follow the shake table runs in saved_CSVs,
+whose names give the amplitude and frequency (a2_f4_plastic.csv):
+    sine   amplitude * sin(2 pi frequency t) for duration seconds
+    pulse  one half-sine of amplitude, half a period of frequency long,
+           like pulse_elastic.csv (duration is ignored)
+    noise  gaussian shaking with amplitude standard deviation for
+           duration seconds
+"""
+from array import array
+import math
+import random
+
+SHAPES = ("sine", "pulse", "noise")
+
+def event_samples(shape, rate, amplitude, frequency, duration, rng=random):
+    """
+    The event on its own, as a list of offsets from the quiet level.
+    """
+    if shape == "sine":
+        step = 2.0 * math.pi * frequency / rate
+        return [amplitude * math.sin(i * step) for i in range(int(duration * rate))]
+    if shape == "pulse":
+        n = max(int(rate / (2.0 * frequency)), 1)
+        return [amplitude * math.sin(math.pi * (i + 0.5) / n) for i in range(n)]
+    if shape == "noise":
+        return [rng.gauss(0.0, amplitude) for i in range(int(duration * rate))]
+    raise ValueError("Unknown shape: " + str(shape))
+
+def make_cycle(rate, shape="sine", amplitude=80.0, frequency=5.0, duration=1.0, every=10.0,
+               level=512.0, noise=1.0, seed=None):
+    """
+    One cycle of the signal at rate samples/second.
+    Returns (array('d') of samples, index of the first event sample).
+    """
+    rng = random.Random(seed)
+    event = event_samples(shape, rate, amplitude, frequency, duration, rng)
+    length = int(every * rate)
+    if length <= len(event):
+        raise ValueError("Events have to be shorter than the cycle, got every=" + str(every)
+                         + " for a " + str(len(event)) + " sample event")
+    onset = length - len(event)
+    gauss = rng.gauss
+    cycle = array('d', [level + gauss(0.0, noise) for i in range(length)])
+    for i, value in enumerate(event):
+        cycle[onset + i] += value
+    return cycle, onset
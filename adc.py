@@ -0,0 +1,227 @@
+"""
+Backends for reading the MCP3008 ADC.
+
+Two ways of talking to the chip:
+    - SpiADC uses the kernel SPI driver (/dev/spidevB.D) and can grab
+      many conversions in a single ioctl. The MCP3008 has to be wired
+      to the Pi's hardware SPI pins (SCLK 11, MISO 9, MOSI 10, CE0 8).
+      The batches come back as fast as the bus runs, not at a sample
+      rate, so the paced acquisition loop reads one sample (or one row
+      of channels) per ioctl and read_many() is for bulk captures.
+    - BitBangADC toggles GPIO pins by hand like we always have. Slow,
+      but works on any four pins (defaults are 18, 23, 24, 25).
+
+Both expose read() -> int (0 thru 1023), read_many(n) -> list of ints,
+and read_channels(channels) -> list with one reading per channel, taken
+back to back so the channels line up in time.
+"""
+import ctypes
+import os
+import struct
+
+# read SPI data from MCP3008 chip, 8 possible adc's (0 thru 7)
+def readadc(adcnum, clockpin, mosipin, misopin, cspin, GPIO):
+    if ((adcnum > 7) or (adcnum < 0)):
+            return -1
+    GPIO.output(cspin, True)
+    GPIO.output(clockpin, False)  # start clock low
+    GPIO.output(cspin, False)     # bring CS low
+    commandout = adcnum
+    commandout |= 0x18  # start bit + single-ended bit
+    commandout <<= 3    # we only need to send 5 bits here
+    for i in range(5):
+            if (commandout & 0x80):
+                    GPIO.output(mosipin, True)
+            else:
+                    GPIO.output(mosipin, False)
+            commandout <<= 1
+            GPIO.output(clockpin, True)
+            GPIO.output(clockpin, False)
+    adcout = 0
+    # read in one empty bit, one null bit and 10 ADC bits
+    for i in range(12):
+            GPIO.output(clockpin, True)
+            GPIO.output(clockpin, False)
+            adcout <<= 1
+            if (GPIO.input(misopin)):
+                    adcout |= 0x1
+    GPIO.output(cspin, True)
+    adcout >>= 1       # first bit is 'null' so drop it
+    return adcout
+
+# ~~~~~~~ Bit-banged GPIO backend ~~~~~~~~~~~~~
+
+class BitBangADC(object):
+    """
+    Reads one channel by toggling GPIO pins (see readadc above).
+    The pins are set up once here rather than on every read, so
+    GPIO.setmode() has to be called before this is created.
+    Pass gpio= to use something other than RPi.GPIO, e.g. fake_hw.FakeGPIO.
+    """
+
+    def __init__(self, channel=0, clockpin=18, misopin=23, mosipin=24, cspin=25, gpio=None):
+        if ((channel > 7) or (channel < 0)):
+            raise ValueError("MCP3008 only has channels 0 thru 7, got " + str(channel))
+        if gpio is None:
+            import RPi.GPIO as gpio
+        self.gpio = gpio
+        self.channel = channel
+        self.clockpin = clockpin
+        self.misopin = misopin
+        self.mosipin = mosipin
+        self.cspin = cspin
+        # # set up the SPI interface pins
+        gpio.setup(mosipin, gpio.OUT)
+        gpio.setup(misopin, gpio.IN)
+        gpio.setup(clockpin, gpio.OUT)
+        gpio.setup(cspin, gpio.OUT)
+
+    def read(self):
+        return readadc(self.channel, self.clockpin, self.mosipin, self.misopin, self.cspin, self.gpio)
+
+    def read_many(self, n):
+        args = (self.channel, self.clockpin, self.mosipin, self.misopin, self.cspin, self.gpio)
+        return [readadc(*args) for i in range(n)]
+
+    def read_channels(self, channels):
+        GPIO = self.gpio
+        return [readadc(channel, self.clockpin, self.mosipin, self.misopin, self.cspin, GPIO) for channel in channels]
+
+    def close(self):
+        pass
+
+# ~~~~~~~ Kernel SPI backend ~~~~~~~~~~~~~
+
+# Bits of linux/spi/spidev.h we need
+SPI_IOC_MAGIC = ord('k')
+SPI_TRANSFER = struct.Struct("QQIIHBBBBBB") # struct spi_ioc_transfer, 32 bytes
+SPI_MAX_TRANSFERS = 511 # SPI_IOC_MESSAGE(n) has to fit in the ioctl size field
+
+def _spi_iow(number, size):
+    return (1 << 30) | (size << 16) | (SPI_IOC_MAGIC << 8) | number
+
+SPI_IOC_WR_MODE = _spi_iow(1, 1)
+SPI_IOC_WR_MAX_SPEED_HZ = _spi_iow(4, 4)
+
+def SPI_IOC_MESSAGE(n):
+    return _spi_iow(0, n * SPI_TRANSFER.size)
+
+class SpidevBus(object):
+    """
+    Thin wrapper around /dev/spidevB.D.
+    transfer(frames) sends every frame in one SPI_IOC_MESSAGE, with chip
+    select released between frames and after the last one, and returns
+    the bytes clocked back. The MCP3008 starts a conversion on each
+    falling edge of chip select.
+    kernel stands in for os.open/fcntl.ioctl/os.close (open(path),
+    ioctl(fd, request, arg), close(fd)), e.g. fake_hw.FakeSpidev off-Pi.
+    """
+
+    def __init__(self, bus=0, device=0, speed_hz=1000000, kernel=None):
+        self.path = "/dev/spidev%d.%d" % (bus, device)
+        self.speed_hz = speed_hz
+        if kernel is None:
+            import fcntl # Linux only, and only needed once there's a bus to talk to
+            self._ioctl = fcntl.ioctl
+            self._close = os.close
+            self.fd = os.open(self.path, os.O_RDWR)
+        else:
+            self._ioctl = kernel.ioctl
+            self._close = kernel.close
+            self.fd = kernel.open(self.path)
+        self._ioctl(self.fd, SPI_IOC_WR_MODE, struct.pack("B", 0))
+        self._ioctl(self.fd, SPI_IOC_WR_MAX_SPEED_HZ, struct.pack("I", speed_hz))
+
+    def transfer(self, frames):
+        frame_len = len(frames[0])
+        tx = ctypes.create_string_buffer(b"".join(frames), frame_len * len(frames))
+        rx = ctypes.create_string_buffer(frame_len * len(frames))
+        tx_addr = ctypes.addressof(tx)
+        rx_addr = ctypes.addressof(rx)
+        message = bytearray()
+        last = len(frames) - 1
+        for i in range(len(frames)):
+            offset = i * frame_len
+            # cs_change between transfers releases chip select; on the last
+            # one it would mean "keep it asserted", so no new conversion next time
+            cs_change = 1 if i < last else 0
+            message += SPI_TRANSFER.pack(tx_addr + offset, rx_addr + offset, frame_len,
+                                         self.speed_hz, 0, 8, cs_change, 0, 0, 0, 0)
+        self._ioctl(self.fd, SPI_IOC_MESSAGE(len(frames)), message)
+        raw = rx.raw
+        return [raw[i:i + frame_len] for i in range(0, len(raw), frame_len)]
+
+    def close(self):
+        if self.fd is not None:
+            self._close(self.fd)
+            self.fd = None
+
+class SpiADC(object):
+    """
+    Reads one channel through an SPI bus (SpidevBus, or fake_hw.FakeSpiDevice off-Pi).
+    read_many(n) batches up to SPI_MAX_TRANSFERS conversions per ioctl.
+    """
+
+    def __init__(self, channel=0, bus=None, batch_size=256):
+        if ((channel > 7) or (channel < 0)):
+            raise ValueError("MCP3008 only has channels 0 thru 7, got " + str(channel))
+        if bus is None:
+            bus = SpidevBus()
+        self.bus = bus
+        self.channel = channel
+        self.batch_size = min(batch_size, SPI_MAX_TRANSFERS)
+        self.frame = self._frame(channel)
+        self._channel_frames = {}
+
+    @staticmethod
+    def _frame(channel):
+        # start bit, then single-ended + channel, then a byte to clock the result out
+        return bytes([0x01, (0x08 | channel) << 4, 0x00])
+
+    def read(self):
+        reply = self.bus.transfer([self.frame])[0]
+        return ((reply[1] & 0x03) << 8) | reply[2]
+
+    def read_many(self, n):
+        values = []
+        while len(values) < n:
+            count = min(self.batch_size, n - len(values))
+            for reply in self.bus.transfer([self.frame] * count):
+                values.append(((reply[1] & 0x03) << 8) | reply[2])
+        return values
+
+    def read_channels(self, channels):
+        # every channel in one transfer
+        key = tuple(channels)
+        frames = self._channel_frames.get(key)
+        if frames is None:
+            for channel in key:
+                if ((channel > 7) or (channel < 0)):
+                    raise ValueError("MCP3008 only has channels 0 thru 7, got " + str(channel))
+            frames = self._channel_frames[key] = [self._frame(channel) for channel in key]
+        return [((reply[1] & 0x03) << 8) | reply[2] for reply in self.bus.transfer(frames)]
+
+    def close(self):
+        self.bus.close()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+ADC_BACKENDS = ("bitbang", "spi")
+
+def open_adc(backend="bitbang", channel=0):
+    """
+    Opens the named backend. Asking for "spi" on a machine without the
+    kernel SPI device falls back to bit-banging with a warning.
+    Bit-banging goes through RPi.GPIO in BCM numbering.
+    """
+    if backend == "spi":
+        try:
+            return SpiADC(channel)
+        except (OSError, IOError) as e:
+            print("SPI device unavailable (" + str(e) + "), falling back to bit-banged GPIO")
+    elif backend != "bitbang":
+        raise ValueError("Unknown ADC backend: " + str(backend))
+    import RPi.GPIO as GPIO
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setwarnings(False)
+    return BitBangADC(channel, gpio=GPIO)
@@ -0,0 +1,52 @@
+"""
+Running estimate of the accelerometer's resting value.
+establish_mean(100) used to pin the zero once at startup, so any
+temperature drift while we waited for an earthquake showed up as
+shaking. The tracker keeps following the quiet signal instead, and is
+frozen while an event is being recorded so the shaking doesn't get
+averaged into the zero.
+"""
+import math
+
+class BaselineTracker(object):
+    """
+    Exponentially weighted mean and variance over roughly the last
+    `window` samples. Until `window` samples have been seen it is a plain
+    running mean/variance, so it's usable straight after startup.
+    The triggers in trigger.py own one and freeze it during events.
+    """
+    __slots__ = ("window", "count", "mean", "variance", "frozen")
+
+    def __init__(self, window=5000):
+        if window < 1:
+            raise ValueError("Baseline window must be at least 1 sample, got " + str(window))
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.frozen = False
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def update(self, value):
+        if self.frozen:
+            return
+        self.count += 1
+        alpha = 1.0 / self.count if self.count < self.window else 1.0 / self.window
+        diff = value - self.mean
+        incr = alpha * diff
+        self.mean += incr
+        if self.count > 1:
+            self.variance = (1.0 - alpha) * (self.variance + diff * incr)
+
+    def freeze(self):
+        self.frozen = True
+
+    def unfreeze(self):
+        self.frozen = False
+
+    def state(self):
+        return {"mean": self.mean, "std": self.std, "count": self.count,
+                "window": self.window, "frozen": self.frozen}
@@ -0,0 +1,89 @@
+"""
+Samples/second for each ADC backend, run off-Pi against the fakes in fake_hw.
+Run from the repo root:  python -m benchmarks.bench_adc [-n NUM_SAMPLES]
+The numbers only cover our Python overhead, not the wire time on a real Pi.
+Also reports what each extra channel costs: read_channels() rows/second
+is the rate every channel gets when recording 1, 2 or 3 axes.
+"""
+import argparse
+import time
+
+from adc import BitBangADC, SpiADC, SpidevBus
+from fake_hw import FakeGPIO, FakeSpiDevice, FakeSpidev
+
+def ramp(channel):
+    ramp.value = (ramp.value + 7) % 1024
+    return ramp.value
+ramp.value = 0
+
+def samples_per_second(read_all, num_samples):
+    start = time.perf_counter()
+    values = read_all(num_samples)
+    elapsed = time.perf_counter() - start
+    assert len(values) == num_samples
+    return num_samples / elapsed
+
+def check_backend(adc):
+    # every backend has to decode the same values the fake chip put out
+    ramp.value = 0
+    got = adc.read_many(50)
+    expected = [(7 * (i + 1)) % 1024 for i in range(50)]
+    assert got == expected, (got[:5], expected[:5])
+
+def check_chip_select():
+    # through the real ioctl packing: chip select has to come back up
+    # after every message, or the next read never starts a conversion
+    ramp.value = 0
+    kernel = FakeSpidev(signal=ramp)
+    adc = SpiADC(bus=SpidevBus(kernel=kernel))
+    got = [adc.read() for i in range(5)] + adc.read_many(20) + adc.read_channels([0, 1])
+    expected = [(7 * (i + 1)) % 1024 for i in range(27)]
+    assert kernel.missed_edges == 0, str(kernel.missed_edges) + " frames without a chip select edge"
+    assert got == expected, (got[:5], expected[:5])
+
+def by_channel(channel):
+    return 100 * channel + 1
+
+def check_channels(adc):
+    # readings come back in the order the channels were asked for
+    got = adc.read_channels([2, 0, 1])
+    assert got == [201, 1, 101], got
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the ADC backends against fake hardware')
+    parser.add_argument('-n','--num', help='Number of samples per backend.', type=int, default=20000)
+    args = vars(parser.parse_args())
+    num_samples = args['num']
+
+    gpio = FakeGPIO(signal=ramp)
+    gpio.setmode(gpio.BCM)
+    bitbang = BitBangADC(gpio=gpio)
+    spi = SpiADC(bus=FakeSpiDevice(signal=ramp))
+    for adc in (bitbang, spi):
+        check_backend(adc)
+    check_chip_select()
+
+    results = [
+        ("bitbang read()", samples_per_second(lambda n: [bitbang.read() for i in range(n)], num_samples)),
+        ("spi read()", samples_per_second(lambda n: [spi.read() for i in range(n)], num_samples)),
+        ("spi read_many()", samples_per_second(spi.read_many, num_samples)),
+    ]
+    print("Backend            samples/second")
+    for name, rate in results:
+        print("  %-16s %12.0f" % (name, rate))
+
+    gpio = FakeGPIO(signal=by_channel)
+    gpio.setmode(gpio.BCM)
+    bitbang = BitBangADC(gpio=gpio)
+    spi = SpiADC(bus=FakeSpiDevice(signal=by_channel))
+    for adc in (bitbang, spi):
+        check_channels(adc)
+    print("read_channels()    channels  rows/second  conversions/second")
+    for name, adc in (("bitbang", bitbang), ("spi", spi)):
+        for count in (1, 2, 3):
+            channels = list(range(count))
+            rate = samples_per_second(lambda n: [adc.read_channels(channels) for i in range(n)], num_samples)
+            print("  %-16s %8d %12.0f %19.0f" % (name, count, rate, rate * count))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Checks displacement.LiveDisplacement against process.py's chain on every
+recording in saved_CSVs, and times add() per row. The reference is the
+causal version of process_file: StreamingBandpass, integrate, again,
+with the same band, on the recording with a zero in front (the live
+integrations start from rest, which is what that zero does).
+Run from the repo root:  python -m benchmarks.bench_displacement [-d saved_CSVs] [-b 1,25]
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from displacement import LiveDisplacement
+from process import readcsv, sampling_rate, integrate, StreamingBandpass
+
+def reference(x, fs, low, high):
+    x = np.concatenate(([0.0], x))
+    t = np.arange(len(x)) / fs
+    v = integrate(StreamingBandpass(low, high, fs).filter(x), t)
+    d = integrate(StreamingBandpass(low, high, fs).filter(v), t)
+    return d[1:]
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks and times live displacement')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings.', default='saved_CSVs')
+    parser.add_argument('-b','--band', help='Bandpass "LOW,HIGH" in Hz. Default "1,25".', default='1,25')
+    args = vars(parser.parse_args())
+    low, high = [float(f) for f in args['band'].split(',')]
+    rows_total = 0
+    elapsed = 0.0
+    worst = 0.0
+    files = sorted(glob.glob(os.path.join(args['dir'], '*.csv')))
+    for fname in files:
+        x, t = readcsv(fname)
+        fs = sampling_rate(t)
+        if high >= fs / 2:
+            continue
+        x = x - np.mean(x)
+        live = LiveDisplacement(fs, low, high)
+        add = live.add
+        rows = [(0, v) for v in x.tolist()]
+        start = time.perf_counter()
+        for row in rows:
+            add(row)
+        elapsed += time.perf_counter() - start
+        rows_total += len(rows)
+        peak = live.peak()[0]
+        live.reset() # again, reading the displacement back after every row
+        d = np.empty(len(rows))
+        for i, row in enumerate(rows):
+            add(row)
+            d[i] = live.displacement()[0]
+        expected = reference(x, fs, low, high)
+        scale = max(np.max(np.abs(expected)), 1e-12)
+        err = np.max(np.abs(d - expected)) / scale
+        worst = max(worst, err)
+        print("%-36s %8d rows  peak %10.4g  max rel diff %.1e" % (os.path.basename(fname), len(rows), peak, err))
+    print("worst relative difference %.1e; add() %.2f us/row" % (worst, 1e6 * elapsed / rows_total))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Checks that chunked StreamingBandpass filtering matches whole-array
+lfilter on every recording in saved_CSVs, and times filter design with
+and without the cache.
+Run from the repo root:  python -m benchmarks.bench_filter [-d saved_CSVs] [-c CHUNK]
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+
+import numpy as np
+from scipy.signal import butter, lfilter, sosfilt
+
+from process import StreamingBandpass, butter_bandpass, dominant_frequency, sampling_rate
+from replay import parse_clock
+
+def load(fname):
+    with open(fname, newline='') as csv_file:
+        rows = [row for row in csv.reader(csv_file) if row]
+    times = np.array([parse_clock(row[0]) for row in rows])
+    return np.array([float(row[1]) for row in rows]), times
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks streaming filtering against lfilter')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings.', default='saved_CSVs')
+    parser.add_argument('-c','--chunk', help='Chunk size for the streaming filter.', type=int, default=257)
+    args = vars(parser.parse_args())
+    checked = 0
+    worst = 0.0
+    for fname in sorted(glob.glob(os.path.join(args['dir'], '*.csv'))):
+        data, times = load(fname)
+        if times[-1] <= times[0]:
+            continue
+        fs = sampling_rate(times)
+        Tb = dominant_frequency(data, fs)
+        low, high = .3*Tb, min(8*Tb, 0.99*fs/2)
+        b, a = butter(2, [low/(fs/2), high/(fs/2)], btype='bandpass')
+        expected = lfilter(b, a, data)
+        bandpass = StreamingBandpass(low, high, fs)
+        got = np.concatenate([bandpass.filter(data[i:i+args['chunk']]) for i in range(0, len(data), args['chunk'])])
+        # chunking must not change the answer at all...
+        whole = sosfilt(bandpass.sos, data)
+        assert np.allclose(got, whole, rtol=0, atol=1e-9 * max(np.max(np.abs(whole)), 1.0)), fname
+        # ...and second-order sections only differ from (b, a) by rounding,
+        # which is largest for the narrowest bands
+        err = np.max(np.abs(got - expected)) / max(np.max(np.abs(expected)), 1e-12)
+        assert err < 1e-3, (fname, err)
+        worst = max(worst, err)
+        checked += 1
+    print('%d files: chunked filtering matches whole-array lfilter (worst relative error %.2e)' % (checked, worst))
+
+    designs = 2000
+    start = time.perf_counter()
+    for i in range(designs):
+        butter(2, [0.01, 0.2], btype='bandpass', output='sos')
+    uncached = (time.perf_counter() - start) / designs
+    start = time.perf_counter()
+    for i in range(designs):
+        butter_bandpass(1.0, 20.0, 200.0, 2)
+    cached = (time.perf_counter() - start) / designs
+    print('filter design: %.1f us uncached, %.2f us cached' % (uncached*1e6, cached*1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Per-sample cost of the bit-banged read with and without GPIO.setup on every call.
+Run from the repo root:  python -m benchmarks.bench_gpio_setup [-n NUM_SAMPLES]
+Uses fake_hw.FakeGPIO, so the times are Python overhead only; the call
+counts are what the real RPi.GPIO would see per sample.
+"""
+import argparse
+import time
+
+from adc import BitBangADC, readadc
+from fake_hw import FakeGPIO
+
+def setup_every_read(gpio):
+    # what readadc_with_settings used to do for every sample
+    def read():
+        gpio.setup(24, gpio.OUT)
+        gpio.setup(23, gpio.IN)
+        gpio.setup(18, gpio.OUT)
+        gpio.setup(25, gpio.OUT)
+        return readadc(0, 18, 24, 23, 25, gpio)
+    return read
+
+def measure(read, gpio, num_samples):
+    gpio.setup_calls = gpio.output_calls = gpio.input_calls = 0
+    start = time.perf_counter()
+    for i in range(num_samples):
+        read()
+    elapsed = time.perf_counter() - start
+    calls = gpio.setup_calls + gpio.output_calls + gpio.input_calls
+    return elapsed / num_samples * 1e6, calls / float(num_samples)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares per-sample GPIO cost before/after hoisting GPIO.setup')
+    parser.add_argument('-n','--num', help='Number of samples per variant.', type=int, default=20000)
+    parser.add_argument('-c','--setupcost', help='Microseconds each fake GPIO.setup() call takes. Defaults to 0 (Python overhead only).', type=float, default=0.0)
+    args = vars(parser.parse_args())
+    num_samples = args['num']
+
+    gpio = FakeGPIO(setup_cost=args['setupcost'] / 1e6)
+    gpio.setmode(gpio.BCM)
+    adc = BitBangADC(gpio=gpio)
+    before = measure(setup_every_read(gpio), gpio, num_samples)
+    after = measure(adc.read, gpio, num_samples)
+    start = time.perf_counter()
+    adc.read_many(num_samples)
+    batched = (time.perf_counter() - start) / num_samples * 1e6
+
+    print("Variant                      us/sample   GPIO calls/sample")
+    print("  setup on every read    %12.2f   %10.1f" % before)
+    print("  BitBangADC.read()      %12.2f   %10.1f" % after)
+    print("  BitBangADC.read_many() %12.2f" % batched)
+    print("Speedup: %.2fx" % (before[0] / after[0]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Measures what the stage timers in instrument.py cost the sampling loop:
+runs record_data from an unclocked SyntheticSource with a scheduler that
+never waits, with and without instruments, and compares the rows
+per second.
+Run from the repo root:  python -m benchmarks.bench_instrument [-n 200000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+
+from instrument import Instruments
+from scheduler import SampleScheduler
+from baseline import BaselineTracker
+from trigger import ThresholdTrigger
+
+from acquisition.loop import record_data
+from acquisition.sources import SyntheticSource
+
+def run(num, instruments, fname):
+    source = SyntheticSource((0,), 100.0, every=10000.0, duration=0.1) # a million quiet samples
+    scheduler = SampleScheduler(None)
+    trigger = ThresholdTrigger(BaselineTracker(10), 1, float("inf")) # never lets go once on
+    trigger.update(source.read()) # the level is far from the empty baseline's 0, so it's on
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds, rows, interrupted, stats = record_data(source, num, trigger, scheduler, fname,
+                                                        float("inf"), 512.0, None, None, instruments)
+    return rows / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the overhead of the stage timers')
+    parser.add_argument('-n','--num', help='Rows per run. Default 200000.', type=int, default=200000)
+    args = vars(parser.parse_args())
+    fd, fname = tempfile.mkstemp(suffix=".bin")
+    os.close(fd)
+    try:
+        plain = run(args['num'], None, fname)
+        instruments = Instruments()
+        timed = run(args['num'], instruments, fname)
+    finally:
+        os.remove(fname)
+    print("without instruments: %10.0f rows/s" % plain)
+    print("with instruments:    %10.0f rows/s  (%.0f%% slower)" % (timed, 100.0 * (1 - timed / plain)))
+    instruments.print_stats()
+
+if __name__ == "__main__":
+    main()
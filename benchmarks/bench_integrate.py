@@ -0,0 +1,54 @@
+"""
+Checks process.integrate against the original loop version on every
+recording in saved_CSVs and times both.
+Run from the repo root:  python -m benchmarks.bench_integrate [-d saved_CSVs]
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+
+import numpy as np
+
+from process import integrate
+from replay import parse_clock
+
+def integrate_loop(data,timestamps):
+    # the original per-element trapezoid, kept as the reference
+    int_data = []; int_data.append(0)
+    for i in range(1,len(data)):
+        delta = timestamps[i] - timestamps[i-1]
+        int_data.append((delta/2)*(data[i-1]+data[i])+int_data[i-1])
+    return (int_data)
+
+def load(fname):
+    with open(fname, newline='') as csv_file:
+        rows = [row for row in csv.reader(csv_file) if row]
+    return [float(row[1]) for row in rows], [parse_clock(row[0]) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks and times vectorized integration')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings.', default='saved_CSVs')
+    args = vars(parser.parse_args())
+    loop_time = vector_time = 0.0
+    worst = 0.0
+    files = sorted(glob.glob(os.path.join(args['dir'], '*.csv')))
+    for fname in files:
+        data, timestamps = load(fname)
+        start = time.perf_counter()
+        expected = integrate_loop(integrate_loop(data, timestamps), timestamps)
+        loop_time += time.perf_counter() - start
+        start = time.perf_counter()
+        got = integrate(integrate(data, timestamps), timestamps)
+        vector_time += time.perf_counter() - start
+        scale = max(np.max(np.abs(expected)), 1.0)
+        err = np.max(np.abs(got - np.asarray(expected))) / scale
+        worst = max(worst, err)
+        assert err < 1e-9, (fname, err)
+    print('%d files match the loop version (worst relative error %.2e)' % (len(files), worst))
+    print('  loop       %8.3f s' % loop_time)
+    print('  vectorized %8.3f s (%.0fx faster)' % (vector_time, loop_time / vector_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Times process.readcsv over every recording in saved_CSVs against a
+row-by-row csv.reader + strptime loader, and checks they agree.
+Run from the repo root:  python -m benchmarks.bench_readcsv [-d saved_CSVs]
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from process import readcsv
+
+def readcsv_rows(fname):
+    # the straightforward way: one strptime per row
+    values = []
+    stamps = []
+    with open(fname, newline='') as csv_file:
+        for row in csv.reader(csv_file):
+            if not row:
+                continue
+            fmt = "%H:%M:%S.%f" if "." in row[0] else "%H:%M:%S"
+            t = datetime.strptime(row[0], fmt)
+            stamps.append(t.hour*3600 + t.minute*60 + t.second + t.microsecond/1e6)
+            values.append(float(row[1]))
+    return values, stamps
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks process.readcsv')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings.', default='saved_CSVs')
+    args = vars(parser.parse_args())
+    files = sorted(glob.glob(os.path.join(args['dir'], '*.csv')))
+    size = sum(os.path.getsize(f) for f in files)
+
+    start = time.perf_counter()
+    expected = [readcsv_rows(f) for f in files]
+    rows_time = time.perf_counter() - start
+    start = time.perf_counter()
+    got = [readcsv(f, even_spacing=False) for f in files]
+    vector_time = time.perf_counter() - start
+
+    samples = 0
+    for fname, (x, t), (ex, et) in zip(files, got, expected):
+        assert np.array_equal(x, ex), fname
+        assert np.allclose(t, et, rtol=0, atol=1e-6), fname # no midnight in these files
+        samples += len(x)
+    print('%d files, %d samples, %.1f MB' % (len(files), samples, size / 1e6))
+    print('  csv.reader + strptime %8.3f s %10.0f samples/s' % (rows_time, samples / rows_time))
+    print('  process.readcsv       %8.3f s %10.0f samples/s' % (vector_time, samples / vector_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Read/write throughput of the CSV and binary recording formats.
+Run from the repo root:  python -m benchmarks.bench_recording [-d saved_CSVs] [-n NUM_SAMPLES]
+Writes go through the same recording writers record_data uses, synced
+after every batch like pipeline.BufferedWriter does, with no fsync, an
+fsync a second (the default) and an fsync every batch; reads compare
+parsing the CSVs with loading the converted binaries.
+"""
+import argparse
+import csv
+import glob
+import math
+import os
+import shutil
+import tempfile
+import time
+
+from recording import CsvRecordingWriter, BinaryRecordingWriter, convert_csv, read_recording
+from replay import parse_clock
+
+def time_write(writer_class, fname, rows, sync_every=None):
+    start = time.perf_counter()
+    writer = writer_class(fname, "w", sync_every=sync_every)
+    for i in range(0, len(rows), 500): # same batch size as pipeline.BufferedWriter
+        writer.write_rows(rows[i:i + 500])
+        writer.sync()
+    writer.close()
+    return time.perf_counter() - start
+
+def read_csv(fname):
+    with open(fname, newline='') as csv_file:
+        return [(parse_clock(row[0]), float(row[1])) for row in csv.reader(csv_file) if row]
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks CSV vs binary recordings')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings to read.', default='saved_CSVs')
+    parser.add_argument('-n','--num', help='Number of samples to write.', type=int, default=200000)
+    args = vars(parser.parse_args())
+    tmp = tempfile.mkdtemp()
+    try:
+        t0 = time.time()
+        rows = [(t0 + i / 1000.0, 5 * math.sin(i / 50.0)) for i in range(args['num'])]
+        print("Writing %d samples" % len(rows))
+        for name, writer_class, ext in (("CSV", CsvRecordingWriter, ".csv"), ("binary", BinaryRecordingWriter, ".bin")):
+            for sync_name, sync_every in (("no fsync", None), ("fsync 1s", 1.0), ("fsync all", 0)):
+                fname = os.path.join(tmp, "write" + ext)
+                elapsed = time_write(writer_class, fname, rows, sync_every)
+                print("  %-7s %-9s %10.0f samples/s %8.2f MB/s %10d bytes" % (name, sync_name, len(rows) / elapsed,
+                      os.path.getsize(fname) / elapsed / 1e6, os.path.getsize(fname)))
+
+        csvs = sorted(glob.glob(os.path.join(args['dir'], "*.csv")))
+        bins = []
+        for csv_name in csvs:
+            bin_name = os.path.join(tmp, os.path.basename(csv_name)[:-4] + ".bin")
+            convert_csv(csv_name, bin_name)
+            bins.append(bin_name)
+        total = 0
+        start = time.perf_counter()
+        for csv_name in csvs:
+            total += len(read_csv(csv_name))
+        csv_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for bin_name in bins:
+            header, records = read_recording(bin_name, mmap=False)
+            assert header["count"] == len(records)
+        bin_time = time.perf_counter() - start
+        csv_bytes = sum(os.path.getsize(f) for f in csvs)
+        bin_bytes = sum(os.path.getsize(f) for f in bins)
+        print("Reading %d files, %d samples" % (len(csvs), total))
+        print("  %-7s %10.0f samples/s %10d bytes" % ("CSV", total / csv_time, csv_bytes))
+        print("  %-7s %10.0f samples/s %10d bytes" % ("binary", total / bin_time, bin_bytes))
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == "__main__":
+    main()
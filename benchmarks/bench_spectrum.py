@@ -0,0 +1,55 @@
+"""
+Checks spectrum.SpectralMonitor against process.dominant_frequency on
+every recording in saved_CSVs: the recording is fed through the monitor
+row by row, and at the end its dominant frequency is compared with an
+FFT of the same last `window` seconds. Also times add() per row.
+Run from the repo root:  python -m benchmarks.bench_spectrum [-d saved_CSVs] [-w 4] [-m 25]
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from process import readcsv, sampling_rate, dominant_frequency
+from spectrum import SpectralMonitor
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks and times the live spectrum')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings.', default='saved_CSVs')
+    parser.add_argument('-w','--window', help='Seconds of signal in the spectrum. Default 4.', type=float, default=4.0)
+    parser.add_argument('-m','--maxfreq', help='Highest frequency looked at, in Hz. Default 25.', type=float, default=25.0)
+    args = vars(parser.parse_args())
+    rows_total = 0
+    elapsed = 0.0
+    agree = 0
+    files = sorted(glob.glob(os.path.join(args['dir'], '*.csv')))
+    print("%-36s %8s %10s %10s" % ("file", "rate", "live Hz", "fft Hz"))
+    for fname in files:
+        x, t = readcsv(fname)
+        fs = sampling_rate(t)
+        x = x - np.mean(x)
+        monitor = SpectralMonitor(fs, 1, args['window'], args['maxfreq'])
+        rows = [(0, v) for v in x.tolist()]
+        add = monitor.add
+        start = time.perf_counter()
+        for row in rows:
+            add(row)
+        elapsed += time.perf_counter() - start
+        rows_total += len(rows)
+        live = monitor.dominant_frequency()
+        # the FFT of what's in the monitor's window, cut to the same band
+        tail = x[-monitor.size * monitor.decimation:]
+        spectrum = np.abs(np.fft.rfft(tail))
+        freqs = np.fft.rfftfreq(len(tail), 1.0 / fs)
+        spectrum[(freqs == 0) | (freqs > args['maxfreq'])] = 0
+        fft = freqs[np.argmax(spectrum)] if len(tail) > 1 else dominant_frequency(x, fs)
+        close = live is not None and abs(live - fft) <= 2 * monitor.resolution
+        agree += close
+        print("%-36s %8.1f %10s %10.3f%s" % (os.path.basename(fname), fs, "%.3f" % live if live else "-", fft,
+                                            "" if close else "  <-"))
+    print("%d of %d within two bins; add() %.2f us/row" % (agree, len(files), 1e6 * elapsed / rows_total))
+
+if __name__ == "__main__":
+    main()
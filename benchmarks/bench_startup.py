@@ -0,0 +1,72 @@
+"""
+Import time of each entry point, from python -X importtime, plus the
+heaviest modules each one pulls in. The acquisition scripts must not
+load numpy, scipy or matplotlib before the first sample; that only
+happens once a recording is plotted or analysed.
+Run from the repo root:  python -m benchmarks.bench_startup [-r RUNS]
+The GPIO scripts import RPi.GPIO, so off the Pi fake_hw.FakeGPIO stands in for it.
+"""
+import argparse
+import subprocess
+import sys
+
+# (entry point, must it stay clear of the heavy imports?)
+ENTRY_POINTS = [
+    ("record_data", True),
+    ("record_data_4_11", True),
+    ("record_data_from_csv", True),
+    ("record_data_from_file", True),
+    ("acquisition.cli", True),
+    ("recording", True),
+    ("process", False),
+]
+HEAVY = ("numpy", "scipy", "matplotlib")
+
+FAKE_GPIO = (
+    "import sys, types, fake_hw\n"
+    "gpio = fake_hw.FakeGPIO()\n"
+    "rpi = types.ModuleType('RPi')\n"
+    "rpi.GPIO = gpio\n"
+    "sys.modules['RPi'] = rpi\n"
+    "sys.modules['RPi.GPIO'] = gpio\n"
+)
+
+def import_profile(module=None):
+    """
+    Imports module in a fresh interpreter. Returns (total us, {module: cumulative us}, heavy modules loaded).
+    With no module, profiles just the interpreter and the fake GPIO.
+    """
+    code = FAKE_GPIO + ("import " + module + "\n" if module else "") \
+        + "print(','.join(m for m in " + repr(HEAVY) + " if m in sys.modules))\n"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, check=True)
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[2].strip()
+        cumulative[name] = max(cumulative.get(name, 0), int(fields[1]))
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative.get(module, 0), cumulative, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks how long each entry point takes to import')
+    parser.add_argument('-r','--runs', help='Best of this many fresh interpreters per entry point. Default 5.', type=int, default=5)
+    args = vars(parser.parse_args())
+    print("Entry point                import (ms)  heavy modules     slowest imports")
+    failed = []
+    startup = import_profile()[1] # site, encodings, ... every interpreter pays for these
+    for module, lean in ENTRY_POINTS:
+        runs = [import_profile(module) for i in range(args['runs'])]
+        total, cumulative, loaded = min(runs, key=lambda run: run[0])
+        slowest = sorted((us, name) for name, us in cumulative.items()
+                         if name != module and "." not in name and name not in startup)[-3:]
+        print("  %-24s %10.1f   %-16s  %s" % (module, total / 1000.0, ",".join(loaded) or "-",
+                                            ", ".join("%s %.1f" % (name, us / 1000.0) for us, name in reversed(slowest))))
+        if lean and loaded:
+            failed.append(module)
+    assert not failed, "acquisition entry points import " + ", ".join(HEAVY) + " at startup: " + ", ".join(failed)
+
+if __name__ == "__main__":
+    main()
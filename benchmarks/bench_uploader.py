@@ -0,0 +1,140 @@
+"""
+Runs uploader.Uploader against a stand-in for the website on localhost
+and checks every result arrives. The server takes POSTed JSON lists over
+keep-alive connections, and can be told to be slow, to fail a fraction
+of batches with 503, or to be down. Three runs:
+    healthy   everything goes through first time
+    flaky     --fail of the batches get a 503 and are retried
+    restart   the server is down while results are posted and the
+              uploader closed; a new uploader on the same spool sends
+              them once the server is back
+For each it reports post() latency (what processing waits for), how
+deep the spool got, throughput, batches, retries and connections used,
+and any results lost or delivered twice.
+Run from the repo root:  python -m benchmarks.bench_uploader [-n 2000] [--fail 0.2] [--delay 0.002]
+"""
+import argparse
+import http.server
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from uploader import Uploader
+
+class StandIn(object):
+    """
+    The website, as far as the uploader can tell.
+    """
+
+    def __init__(self, fail=0.0, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.up = True
+        self.received = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive
+
+            def setup(self):
+                http.server.BaseHTTPRequestHandler.setup(self)
+                with stand_in.lock:
+                    stand_in.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(stand_in.delay)
+                if not stand_in.up:
+                    self.close_connection = True
+                    return # hang up without answering
+                status = 503 if random.random() < stand_in.fail else 200
+                if status == 200:
+                    with stand_in.lock:
+                        stand_in.received.extend(json.loads(body))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:%d/results" % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def post_all(uploader, ids):
+    worst = 0.0
+    for i in ids:
+        start = time.perf_counter()
+        uploader.post({"id": i, "file": "saved_CSVs/event%d.csv" % i, "peak_displacement": 0.25, "final_displacement": -0.01})
+        worst = max(worst, time.perf_counter() - start)
+    return worst
+
+def report(name, server, ids, elapsed, worst_post, stats):
+    got = [r["id"] for r in server.received]
+    lost = len(set(ids) - set(got))
+    twice = len(got) - len(set(got))
+    print("%-8s %6d %9.0f %8.2f %6d %8d %8d %6d %5d %5d %6d" % (name, len(ids), len(ids) / elapsed, 1000 * worst_post,
+          stats["max_depth"], stats["batches"], stats["retries"], stats["connections"], server.connections, lost, twice))
+    return lost == 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks the uploader against a local stand-in server')
+    parser.add_argument('-n','--num', help='Results to post per run. Default 2000.', type=int, default=2000)
+    parser.add_argument('--fail', help='Fraction of batches the flaky server rejects. Default 0.2.', type=float, default=0.2)
+    parser.add_argument('--delay', help='Seconds the server takes per batch. Default 0.002.', type=float, default=0.002)
+    args = vars(parser.parse_args())
+    ok = True
+    print("%-8s %6s %9s %8s %6s %8s %8s %6s %5s %5s %6s" % ("run", "posts", "sent/s", "post ms", "depth",
+          "batches", "retries", "conns", "srv", "lost", "twice"))
+    for name, fail in (("healthy", 0.0), ("flaky", args['fail'])):
+        spool = tempfile.mkdtemp(prefix="spool")
+        server = StandIn(fail, args['delay'])
+        try:
+            uploader = Uploader(server.url, spool, min_backoff=0.01, max_backoff=0.1)
+            ids = list(range(args['num']))
+            start = time.perf_counter()
+            worst_post = post_all(uploader, ids)
+            uploader.flush(60.0)
+            elapsed = time.perf_counter() - start
+            uploader.close()
+            ok &= report(name, server, ids, elapsed, worst_post, uploader.stats())
+        finally:
+            server.close()
+            shutil.rmtree(spool)
+
+    spool = tempfile.mkdtemp(prefix="spool")
+    server = StandIn(0.0, args['delay'])
+    try:
+        server.up = False
+        uploader = Uploader(server.url, spool, min_backoff=0.01, max_backoff=0.05)
+        ids = list(range(args['num']))
+        start = time.perf_counter()
+        worst_post = post_all(uploader, ids)
+        time.sleep(0.2) # a few failed tries
+        uploader.close(5.0)
+        server.up = True
+        uploader = Uploader(server.url, spool, min_backoff=0.01, max_backoff=0.05)
+        uploader.flush(60.0)
+        elapsed = time.perf_counter() - start
+        uploader.close()
+        stats = uploader.stats()
+        stats["max_depth"] = max(stats["max_depth"], len(ids))
+        ok &= report("restart", server, ids, elapsed, worst_post, stats)
+    finally:
+        server.close()
+        shutil.rmtree(spool)
+    print("all delivered" if ok else "RESULTS LOST")
+
+if __name__ == "__main__":
+    main()
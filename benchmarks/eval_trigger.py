@@ -0,0 +1,116 @@
+"""
+Offline evaluation of the event triggers on saved_CSVs.
+
+The event captures start mid-shake, so each one is replayed after a
+quiet lead-in taken from noise2.csv (shifted to the capture's median),
+the way the detector would see it live. The quiet recordings (noise*,
+pos1xg, neg1xg) are replayed as they are. Single-sample spikes are
+added to the quiet parts to check that lone glitches don't start a
+recording. Like record_data, the baseline is started off with the
+first 100 samples and then tracked by the trigger.
+
+Reports false triggers (any trigger in quiet data), missed events (no
+trigger once the capture starts), how many pieces each event got
+chopped into and the cost of update() per sample.
+Run from the repo root:  python -m benchmarks.eval_trigger [-d saved_CSVs]
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from process import readcsv
+from baseline import BaselineTracker
+from trigger import StaLtaTrigger, ThresholdTrigger
+
+QUIET = ("noise", "1xg")
+
+def add_spikes(values, num_spikes, size):
+    # evenly spaced single-sample glitches, alternating sign
+    values = list(values)
+    for k in range(num_spikes):
+        i = (k + 1) * len(values) // (num_spikes + 1)
+        values[i] += size if k % 2 == 0 else -size
+    return values
+
+def run(trigger, values, event_start):
+    """
+    Returns (triggers before event_start, triggers from event_start on, seconds taken).
+    """
+    before = after = 0
+    was_on = False
+    start = time.perf_counter()
+    for i, value in enumerate(values):
+        on = trigger.update(value)
+        if on and not was_on:
+            if i < event_start:
+                before += 1
+            else:
+                after += 1
+        was_on = on
+    return before, after, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluates the event triggers on saved recordings')
+    parser.add_argument('-d','--dir', help='Directory of CSV recordings.', default='saved_CSVs')
+    parser.add_argument('-l','--leadin', help='Quiet samples replayed before each event capture.', type=int, default=3000)
+    parser.add_argument('--spikes', help='Single-sample spikes added to each quiet stretch.', type=int, default=5)
+    parser.add_argument('--spikesize', help='Size of those spikes in ADC counts.', type=float, default=8)
+    parser.add_argument('-t','--tolerance', help='Threshold trigger tolerance.', type=float, default=5)
+    parser.add_argument('-e','--endtolerance', help='Threshold trigger end tolerance.', type=float, default=5)
+    parser.add_argument('-k','--sigmas', help='Also evaluate the threshold trigger with this many baseline sigmas.', type=float, default=10)
+    parser.add_argument('-w','--baselinewindow', type=int, default=5000)
+    parser.add_argument('--sta', type=int, default=50)
+    parser.add_argument('--lta', type=int, default=1000)
+    parser.add_argument('--on', type=float, default=4.0)
+    parser.add_argument('--off', type=float, default=1.5)
+    args = vars(parser.parse_args())
+    makers = [
+        ("threshold", lambda baseline: ThresholdTrigger(baseline, args['tolerance'], args['endtolerance'])),
+        ("sigma", lambda baseline: ThresholdTrigger(baseline, args['tolerance'], args['endtolerance'], args['sigmas'])),
+        ("stalta", lambda baseline: StaLtaTrigger(baseline, args['sta'], args['lta'], args['on'], args['off'])),
+    ]
+    noise = readcsv(os.path.join(args['dir'], 'noise2.csv'))[0]
+    noise = (noise - noise[:100].mean())[:args['leadin']]
+    totals = dict((name, {"false": 0, "missed": 0, "pieces": 0, "events": 0, "time": 0.0, "samples": 0})
+                  for name, maker in makers)
+
+    print("%-34s %5s  %s" % ("file", "quiet", "  ".join("%17s" % (name + " false/on") for name, maker in makers)))
+    for fname in sorted(glob.glob(os.path.join(args['dir'], '*.csv'))):
+        values = readcsv(fname)[0]
+        quiet = any(tag in os.path.basename(fname) for tag in QUIET)
+        if quiet:
+            stream = add_spikes(values, args['spikes'], args['spikesize'])
+            event_start = len(stream)
+        else:
+            lead = add_spikes(np.median(values) + noise, args['spikes'], args['spikesize'])
+            stream = lead + values.tolist()
+            event_start = len(lead)
+        cells = []
+        for name, maker in makers:
+            baseline = BaselineTracker(args['baselinewindow'])
+            for value in stream[:100]:
+                baseline.update(value)
+            before, after, elapsed = run(maker(baseline), stream[100:], event_start - 100)
+            total = totals[name]
+            total["false"] += before
+            total["time"] += elapsed
+            total["samples"] += len(stream)
+            if not quiet:
+                total["events"] += 1
+                total["pieces"] += after
+                if after == 0:
+                    total["missed"] += 1
+            cells.append("%17s" % ("%d/%d" % (before, after)))
+        print("%-34s %5s  %s" % (os.path.basename(fname), "yes" if quiet else "", "  ".join(cells)))
+
+    print("\nTrigger      false triggers  missed events  pieces/event  us/sample")
+    for name, maker in makers:
+        total = totals[name]
+        print("  %-10s %14d %14d %13.1f %10.2f" % (name, total["false"], total["missed"],
+              total["pieces"] / float(total["events"]), total["time"] / total["samples"] * 1e6))
+
+if __name__ == '__main__':
+    main()
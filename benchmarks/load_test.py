@@ -0,0 +1,82 @@
+"""
+Load test of the acquisition loop: drives run_until_threshold and
+record_data from a clocked SyntheticSource (samples it doesn't get to
+in time are lost, like with the real ADC) at increasing rates, for each
+recording format and channel count, and reports per configuration
+    rows/s      rows recorded per second during events
+    missed      scheduler slots skipped because the loop fell behind
+    dropped     rows the background writer had to drop
+    queue       deepest the writer queue got
+    latency     from the first sample of an event to the trigger firing,
+                mean and worst over the events (includes the trigger's
+                own detection delay, which is most of it)
+Run from the repo root:  python -m benchmarks.load_test [-z 1000,5000,20000] [-e EVENTS]
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import shutil
+import tempfile
+
+from scheduler import SampleScheduler
+from trigger import StaLtaTrigger, AnyChannelTrigger
+
+from acquisition.loop import new_buffer, establish_baseline, run_until_threshold, record_data
+from acquisition.sources import SyntheticSource
+from acquisition.synthetic import SHAPES
+
+def make_trigger(baseline):
+    if isinstance(baseline, list):
+        return AnyChannelTrigger(StaLtaTrigger(b) for b in baseline)
+    return StaLtaTrigger(baseline)
+
+def run_config(rate, fmt, num_channels, events, signal, tmpdir):
+    source = SyntheticSource(range(num_channels), rate, clocked=True, seed=1, **signal)
+    scheduler = SampleScheduler(rate)
+    ring = new_buffer(source, int(0.5 * rate))
+    result = {"rows": 0, "seconds": 0.0, "dropped": 0, "queue": 0, "latency": []}
+    with contextlib.redirect_stdout(io.StringIO()): # the loop prints as it goes
+        trigger = make_trigger(establish_baseline(source, 100, 5000))
+        for event in range(events):
+            run_until_threshold(source, ring, trigger, scheduler)
+            result["latency"].append(source.samples_since_onset() / float(rate))
+            fname = os.path.join(tmpdir, "event%d.%s" % (event, fmt))
+            seconds, rows, interrupted, stats = record_data(source, float("inf"), trigger, scheduler, fname,
+                                                            float("inf"), trigger.mean, ring, None, None, ring)
+            result["rows"] += rows
+            result["seconds"] += seconds
+            result["dropped"] += stats["dropped"]
+            result["queue"] = max(result["queue"], stats["max_depth"])
+    result["missed"] = scheduler.stats()["missed_slots"]
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Load tests the acquisition loop with synthetic ground motion')
+    parser.add_argument('-z','--rates', help='Comma separated sample rates. Default 1000,5000,10000,20000,50000.', default='1000,5000,10000,20000,50000')
+    parser.add_argument('-f','--formats', help='Comma separated recording formats. Default csv,bin.', default='csv,bin')
+    parser.add_argument('-c','--channels', help='Comma separated channel counts. Default 1,3.', default='1,3')
+    parser.add_argument('-e','--events', help='Events per configuration. Default 2.', type=int, default=2)
+    parser.add_argument('--shape', help='Event shape. Default sine.', choices=SHAPES, default='sine')
+    parser.add_argument('--duration', help='Event length in seconds. Default 0.5.', type=float, default=0.5)
+    parser.add_argument('--every', help='Seconds from one event to the next. Default 2.', type=float, default=2.0)
+    args = vars(parser.parse_args())
+    signal = {"shape": args['shape'], "duration": args['duration'], "every": args['every'], "frequency": 5.0}
+    rates = [float(r) for r in args['rates'].split(',')]
+    formats = args['formats'].split(',')
+    channel_counts = [int(c) for c in args['channels'].split(',')]
+    tmpdir = tempfile.mkdtemp(prefix="load_test")
+    try:
+        print("%8s %4s %3s %10s %9s %8s %6s %14s" % ("rate", "fmt", "ch", "rows/s", "missed", "dropped", "queue", "latency ms"))
+        for rate, fmt, num_channels in itertools.product(rates, formats, channel_counts):
+            r = run_config(rate, fmt, num_channels, args['events'], signal, tmpdir)
+            latency = r["latency"]
+            print("%8.0f %4s %3d %10.0f %9d %8d %6d %6.1f / %5.1f" % (
+                rate, fmt, num_channels, r["rows"] / r["seconds"] if r["seconds"] else 0.0, r["missed"],
+                r["dropped"], r["queue"], 1000 * sum(latency) / len(latency), 1000 * max(latency)))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
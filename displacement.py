@@ -0,0 +1,100 @@
+"""
+Live displacement while an event is being recorded.
+process.process_file gets displacement after the fact: bandpass the
+whole recording, integrate, bandpass again, integrate. LiveDisplacement
+runs the same chain one row at a time, so velocity and displacement are
+known while the table is still shaking:
+    - the bandpass is process.butter_bandpass, run as its second-order
+      sections with the state carried from row to row (causal, so like
+      StreamingBandpass and not a zero-phase filter)
+    - the integrations are trapezoids at the sample rate
+The filter is designed once, up front (that imports scipy). After that
+a row only does float arithmetic on state preallocated in one array: no
+lists, arrays or numpy in the per-row path.
+"""
+from array import array
+
+class LiveDisplacement(object):
+    """
+    Fed rows of (time, value, ...) with `width` values through add(),
+    like plotting.EventTrace. velocity(), displacement() and peak() are
+    per channel, in ADC counts * seconds and counts * seconds**2, the
+    same units process.py gives.
+    add() returns True every report_every seconds of rows, when it's a
+    good time to print summary().
+    """
+
+    def __init__(self, rate, low, high, width=1, order=2, report_every=1.0):
+        if not rate or rate <= 0:
+            raise ValueError("Displacement needs the sample rate, got " + str(rate))
+        if not 0 < low < high:
+            raise ValueError("Need a band with 0 < low < high, got " + str((low, high)))
+        from process import butter_bandpass
+        sos = butter_bandpass(float(low), float(high), float(rate), order)
+        # b0, b1, b2, a1, a2 of every section (a0 is always 1)
+        self.sections = [tuple(float(c) for c in (s[0], s[1], s[2], s[4], s[5])) for s in sos]
+        self.rate = rate
+        self.band = (low, high)
+        self.width = width
+        self.dt = 1.0 / rate
+        # per channel: 2 zi per section for each of the two filters, then
+        # last acceleration, velocity, last filtered velocity, displacement, peak
+        self._zi = 2 * len(self.sections)
+        self._stride = 2 * self._zi + 5
+        self.state = array('d', bytes(8 * self._stride * width))
+        self.report_every = max(int(report_every * rate), 1)
+        self.reset()
+
+    def reset(self):
+        for k in range(len(self.state)):
+            self.state[k] = 0.0
+        self.count = 0
+
+    def _filter(self, x, base):
+        state = self.state
+        for b0, b1, b2, a1, a2 in self.sections:
+            y = b0 * x + state[base]
+            state[base] = b1 * x - a1 * y + state[base + 1]
+            state[base + 1] = b2 * x - a2 * y
+            x = y
+            base += 2
+        return x
+
+    def add(self, row):
+        state = self.state
+        half_dt = 0.5 * self.dt
+        base = 0
+        for c in range(self.width):
+            a = self._filter(row[c + 1], base)
+            k = base + 2 * self._zi
+            # velocity, then filter it the same way, then displacement
+            state[k + 1] += half_dt * (state[k] + a)
+            state[k] = a
+            v = self._filter(state[k + 1], base + self._zi)
+            d = state[k + 3]
+            d += half_dt * (state[k + 2] + v)
+            state[k + 2] = v
+            state[k + 3] = d
+            if abs(d) > state[k + 4]:
+                state[k + 4] = abs(d)
+            base += self._stride
+        self.count += 1
+        return self.count % self.report_every == 0
+
+    def _column(self, offset):
+        return [self.state[c * self._stride + 2 * self._zi + offset] for c in range(self.width)]
+
+    def velocity(self):
+        return self._column(2)
+
+    def displacement(self):
+        return self._column(3)
+
+    def peak(self):
+        """
+        Largest |displacement| since reset(), per channel.
+        """
+        return self._column(4)
+
+    def summary(self):
+        return "Displacement: " + ", ".join("%.4g (peak %.4g)" % (d, p) for d, p in zip(self.displacement(), self.peak()))
@@ -0,0 +1,170 @@
+"""
+Stand-ins for the Raspberry Pi hardware so the ADC code runs off-Pi.
+
+The fakes behave like an MCP3008 whose channels read signal(channel),
+an int from 0 thru 1023. By default every channel reads 512.
+"""
+import ctypes
+import time
+
+def _constant_signal(channel):
+    return 512
+
+def _mcp3008_reply(frame, signal):
+    if not (frame[0] & 0x01):  # no start bit, chip stays quiet
+        return bytes(len(frame))
+    channel = (frame[1] >> 4) & 0x07
+    value = int(signal(channel)) & 0x3FF
+    return bytes([0, value >> 8, value & 0xFF])
+
+class FakeSpiDevice(object):
+    """
+    Drop-in for adc.SpidevBus: answers each 3 byte MCP3008 frame.
+    """
+
+    def __init__(self, signal=None):
+        self.signal = signal or _constant_signal
+        self.transfers = 0
+        self.frames = 0
+
+    def transfer(self, frames):
+        self.transfers += 1
+        self.frames += len(frames)
+        return [_mcp3008_reply(frame, self.signal) for frame in frames]
+
+    def close(self):
+        pass
+
+class FakeSpidev(object):
+    """
+    Stand-in for the spidev kernel driver under adc.SpidevBus (pass it as
+    kernel=), so the real ioctl message packing gets run. It reads the
+    spi_ioc_transfer structs and the tx buffers they point at, writes the
+    replies into the rx buffers, and tracks chip select like the wire
+    does: a frame only starts a conversion if chip select went high
+    before it. A frame that doesn't reads back 0x3FF and is counted in
+    missed_edges.
+    """
+
+    def __init__(self, signal=None):
+        self.signal = signal or _constant_signal
+        self.cs_asserted = False
+        self.messages = 0
+        self.frames = 0
+        self.missed_edges = 0
+
+    def open(self, path):
+        return 3
+
+    def close(self, fd):
+        pass
+
+    def ioctl(self, fd, request, arg):
+        from adc import SPI_TRANSFER, SPI_IOC_MESSAGE
+        if len(arg) % SPI_TRANSFER.size or request != SPI_IOC_MESSAGE(len(arg) // SPI_TRANSFER.size):
+            return 0 # mode and speed settings
+        self.messages += 1
+        count = len(arg) // SPI_TRANSFER.size
+        for i in range(count):
+            tx, rx, length, speed, delay, bits, cs_change = SPI_TRANSFER.unpack_from(arg, i * SPI_TRANSFER.size)[:7]
+            frame = ctypes.string_at(tx, length)
+            if self.cs_asserted: # no falling edge, the chip is still shifting out the last result
+                self.missed_edges += 1
+                reply = bytes([0, 0x03, 0xFF])
+            else:
+                reply = _mcp3008_reply(frame, self.signal)
+            ctypes.memmove(rx, reply, length)
+            self.frames += 1
+            if i < count - 1:
+                self.cs_asserted = not cs_change
+            else:
+                self.cs_asserted = bool(cs_change)
+        return 0
+
+class FakeGPIO(object):
+    """
+    Mimics the bits of RPi.GPIO that adc.readadc uses, and plays the
+    MCP3008 side of the bit-banged protocol on whatever pins get set up.
+    Counts setup/output/input calls so benchmarks can report them.
+    setup_cost busy-waits that many seconds per setup() call, to stand in
+    for the register pokes and pull-up settling the real library does.
+    """
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+
+    def __init__(self, signal=None, clockpin=18, misopin=23, mosipin=24, cspin=25, setup_cost=0.0):
+        self.signal = signal or _constant_signal
+        self.setup_cost = setup_cost
+        self.clockpin = clockpin
+        self.misopin = misopin
+        self.mosipin = mosipin
+        self.cspin = cspin
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        self.setup_calls = 0
+        self.output_calls = 0
+        self.input_calls = 0
+        self._reset()
+
+    def _reset(self):
+        self._command = 0
+        self._command_bits = 0
+        self._reply = []
+        self._reply_index = -1
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction):
+        self.setup_calls += 1
+        if self.setup_cost:
+            until = time.perf_counter() + self.setup_cost
+            while time.perf_counter() < until:
+                pass
+        if self.mode is None:
+            raise RuntimeError("Please set pin numbering mode using GPIO.setmode(GPIO.BOARD) or GPIO.setmode(GPIO.BCM)")
+        if direction not in (self.OUT, self.IN):
+            raise ValueError("An invalid direction was passed to setup()")
+        self.directions[pin] = direction
+        self.levels.setdefault(pin, False)
+
+    def output(self, pin, value):
+        self.output_calls += 1
+        if self.directions.get(pin) != self.OUT:
+            raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+        rising = value and not self.levels[pin]
+        self.levels[pin] = bool(value)
+        if pin == self.cspin and value:
+            self._reset()
+        elif pin == self.clockpin and rising and not self.levels[self.cspin]:
+            self._clock()
+
+    def _clock(self):
+        if self._command_bits < 5:
+            self._command = (self._command << 1) | int(self.levels[self.mosipin])
+            self._command_bits += 1
+            if self._command_bits == 5:
+                # start, single-ended, D2 D1 D0 -> empty bit, 10 data bits MSB first
+                value = int(self.signal(self._command & 0x07)) & 0x3FF
+                self._reply = [0] + [(value >> bit) & 1 for bit in range(9, -1, -1)] + [0]
+        else:
+            self._reply_index += 1
+
+    def input(self, pin):
+        self.input_calls += 1
+        if self.directions.get(pin) != self.IN:
+            raise RuntimeError("You must setup() the GPIO channel first")
+        if pin != self.misopin or not (0 <= self._reply_index < len(self._reply)):
+            return 0
+        return self._reply[self._reply_index]
+
+    def cleanup(self):
+        self.directions = {}
+        self.levels = {}
+        self._reset()
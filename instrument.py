@@ -0,0 +1,145 @@
+"""
+Per-stage timing for the sampling loop.
+When the achieved rate drops, the stage timers say which part of the
+loop is slow: the scheduler's wait, the ADC read, the trigger, queueing
+the row, or the writer thread's disk writes.
+    - Every stage keeps a count, total, max and a histogram of
+      power-of-two nanosecond bins, allocated once, so timing a call is
+      two perf_counter_ns() calls and a few integer adds.
+    - Stages are timed by wrapping the function once, before the loop
+      starts (Instruments.wrap). With instruments turned off, wrap()
+      hands the function back untouched, so the loop runs exactly the
+      code it runs without instrumentation.
+    - snapshot() is a plain dict; dump() writes it as JSON, and
+      install_signal() makes `kill -USR1 <pid>` dump it mid-run.
+"""
+from array import array
+import json
+import signal
+import time
+
+NUM_BINS = 64 # bin k counts durations of 2**(k-1) up to 2**k - 1 ns
+
+class StageTimer(object):
+    __slots__ = ("name", "bins", "count", "total_ns", "max_ns")
+
+    def __init__(self, name):
+        self.name = name
+        self.bins = array('Q', [0]) * NUM_BINS
+        self.reset()
+
+    def reset(self):
+        for k in range(NUM_BINS):
+            self.bins[k] = 0
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, ns):
+        self.bins[ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, p):
+        """
+        Upper edge, in ns, of the bin holding the p-th percentile (0-100).
+        """
+        if not self.count:
+            return 0
+        target = self.count * p / 100.0
+        seen = 0
+        for k in range(NUM_BINS):
+            seen += self.bins[k]
+            if seen >= target:
+                return min((1 << k) - 1, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / self.count / 1000.0 if self.count else 0.0,
+            "p50_us": self.percentile(50) / 1000.0,
+            "p99_us": self.percentile(99) / 1000.0,
+            "max_us": self.max_ns / 1000.0,
+            "total_s": self.total_ns / 1e9,
+            # [upper edge in ns, count] for every bin in use
+            "histogram": [[(1 << k) - 1, self.bins[k]] for k in range(NUM_BINS) if self.bins[k]],
+        }
+
+class Instruments(object):
+    """
+    A set of named StageTimers and counters. enabled=False makes wrap()
+    a no-op and count() free to call.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self.started = time.time()
+        self._start_ns = time.perf_counter_ns()
+
+    def stage(self, name):
+        timer = self.stages.get(name)
+        if timer is None:
+            timer = self.stages[name] = StageTimer(name)
+        return timer
+
+    def wrap(self, name, func):
+        """
+        func, timed as stage `name` on every call.
+        """
+        if not self.enabled:
+            return func
+        add = self.stage(name).add
+        clock = time.perf_counter_ns
+        def timed(*args):
+            start = clock()
+            result = func(*args)
+            add(clock() - start)
+            return result
+        return timed
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        return {
+            "started": self.started,
+            "elapsed_s": (time.perf_counter_ns() - self._start_ns) / 1e9,
+            "stages": dict((name, timer.to_dict()) for name, timer in self.stages.items()),
+            "counters": dict(self.counters),
+        }
+
+    def dump(self, fname):
+        with open(fname, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def install_signal(self, fname, signum=None):
+        """
+        Dumps to fname whenever the process gets signum (SIGUSR1 by default).
+        """
+        if signum is None:
+            signum = signal.SIGUSR1
+        def handler(received, frame):
+            self.dump(fname)
+            print("Stage timings written to "+fname)
+        signal.signal(signum, handler)
+
+    def print_stats(self):
+        print("  Stage           calls    mean us     p99 us     max us")
+        for name, timer in self.stages.items():
+            stats = timer.to_dict()
+            print("  %-12s %8d %10.1f %10.1f %10.1f" % (name, stats["count"], stats["mean_us"],
+                                                     stats["p99_us"], stats["max_us"]))
+
+def timed(instruments, name, func):
+    """
+    instruments.wrap(name, func), or func itself when there are no instruments.
+    """
+    if instruments is None:
+        return func
+    return instruments.wrap(name, func)
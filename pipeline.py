@@ -0,0 +1,138 @@
+"""
+Keeps disk writes out of the sampling loop.
+The acquisition loop put()s rows into a bounded queue and returns right
+away; a writer thread drains the queue and writes rows out in batches,
+so an SD card stall only fills the queue instead of delaying the next read.
+"""
+import queue
+import threading
+import time
+
+_STOP = object()
+
+class BufferedWriter(object):
+    """
+    Background writer in front of a recording writer (see recording.py),
+    which it owns and closes.
+        - maxsize is how many rows can be waiting before the queue is full.
+        - Rows are written batch_size at a time, or whatever has come in
+          batch_wait seconds after the first row of a batch, whichever
+          is first, so a writer that keeps up still writes in batches.
+        - When it is full, put() blocks for up to max_wait seconds
+          (backpressure), then drops the row and counts it.
+          max_wait=0 drops straight away.
+        - first, if given, is called with the recording on the writer
+          thread before any put() row is written, and returns how many
+          rows it wrote. record_data saves the pre-trigger ring with it,
+          so that doesn't hold up the sampling either.
+        - close() (or leaving a with block) waits for every queued row
+          to hit the file, so a Ctrl-C doesn't lose the tail of a recording.
+          Write errors don't raise: they end up in self.error and stats(),
+          and a recording that lost rows is left as its .part file.
+    """
+
+    def __init__(self, recording, maxsize=10000, batch_size=500, max_wait=0.05, batch_wait=0.1, first=None):
+        self.recording = recording
+        self.first = first
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_wait = max_wait
+        self.queue = queue.Queue(maxsize)
+        self.written = 0
+        self.dropped = 0
+        self.backpressure = 0
+        self.max_depth = 0
+        self.batches = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="recording-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, row):
+        """
+        Queues one row. Returns False if it had to be dropped.
+        """
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.backpressure += 1
+            try:
+                if not self.max_wait:
+                    raise
+                self.queue.put(row, timeout=self.max_wait)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def _run(self):
+        if self.first is not None:
+            try:
+                self.written += self.first(self.recording)
+                self.recording.sync()
+            except (IOError, OSError) as e:
+                self.error = e
+        get = self.queue.get
+        while True:
+            batch = [get()]
+            deadline = time.monotonic() + self.batch_wait
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        batch.append(self.queue.get_nowait())
+                    else:
+                        batch.append(get(timeout=timeout))
+            except queue.Empty:
+                pass
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                try:
+                    self.recording.write_rows(batch)
+                    self.recording.sync() # fsync every so often
+                except (IOError, OSError) as e:
+                    self.error = e
+                    self.dropped += len(batch)
+                else:
+                    self.written += len(batch)
+                    self.batches += 1
+            if stop:
+                return
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP) # always block here, the sentinel can't be dropped
+            self._thread.join()
+        self.recording.close(complete=self.error is None)
+        if self.error is None:
+            self.error = self.recording.error
+        if self.error is not None:
+            print("Writing to "+self.recording.fname+" failed: "+str(self.error)+", what was written is in "+self.recording.path)
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "backpressure": self.backpressure,
+            "max_depth": self.max_depth,
+            "batches": self.batches,
+            "error": str(self.error) if self.error is not None else None,
+            "file": self.recording.fname if self.error is None else self.recording.path, # where the rows are
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("  Rows written    : "+str(stats["written"])+" in "+str(stats["batches"])+" batches")
+        print("  Rows dropped    : "+str(stats["dropped"])+" ("+str(stats["backpressure"])+" times the queue was full)")
+        print("  Max queue depth : "+str(stats["max_depth"]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,161 @@
+"""
+Event plots, rendered to image files off the acquisition thread.
+main() used to re-read the recording with genfromtxt and block on
+plt.show(), which stops us recording and needs a display. Instead the
+samples of an event are kept in memory as they're recorded (EventTrace)
+and handed to a PlotWorker, which draws them with matplotlib's Agg
+backend on its own thread and saves a PNG while we go back to monitoring.
+Long events are cut down with min/max decimation first, which keeps
+every peak a plain every-Nth-sample decimation would miss.
+"""
+from array import array
+import queue
+import threading
+
+_STOP = object()
+
+class EventTrace(object):
+    """
+    The rows of one event, (time, value, ...) with `width` values each,
+    as saved to the recording, times in integer nanoseconds from
+    time.perf_counter_ns(). Stored in flat arrays like the rings in
+    ringbuffer.py, 8 bytes a number.
+    """
+    __slots__ = ("width", "times", "values")
+
+    def __init__(self, width=1):
+        self.width = width
+        self.times = array('q')
+        self.values = array('d')
+
+    def add(self, row):
+        self.times.append(row[0])
+        if self.width == 1:
+            self.values.append(row[1])
+        else:
+            self.values.extend(row[1:])
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def prepend(self, other):
+        """
+        Puts the rows of other, an EventTrace as wide as this one, in
+        front of these.
+        """
+        self.times[0:0] = other.times
+        self.values[0:0] = other.values
+
+    def __len__(self):
+        return len(self.times)
+
+def minmax_indices(values, max_points):
+    """
+    Indices of the samples to draw so at most about max_points are left:
+    the values are split into max_points/2 buckets and the smallest and
+    largest sample of each is kept, in time order. values is 1-D.
+    """
+    import numpy as np
+    n = len(values)
+    if not max_points or n <= max_points:
+        return np.arange(n)
+    buckets = max(max_points // 2, 1)
+    size = n // buckets
+    m = buckets * size
+    blocks = values[:m].reshape(buckets, size)
+    lo = blocks.argmin(axis=1)
+    hi = blocks.argmax(axis=1)
+    starts = np.arange(buckets) * size
+    idx = np.empty(2 * buckets, dtype=np.intp)
+    idx[0::2] = starts + np.minimum(lo, hi)
+    idx[1::2] = starts + np.maximum(lo, hi)
+    return np.concatenate((idx, np.arange(m, n))) # plus the last partial bucket as is
+
+def render_event(trace, fname, max_points=20000, title='Recorded Ground Motion', labels=None):
+    """
+    Draws an EventTrace to fname (the format goes by the extension) and
+    returns fname. Doesn't touch pyplot, so it is safe off the main thread
+    and needs no display.
+    """
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    times = np.frombuffer(trace.times, dtype=np.int64)
+    values = np.frombuffer(trace.values, dtype=np.float64).reshape(-1, trace.width)
+    times = (times - times[0]) / 1e9 if len(times) else times.astype(np.float64)
+    fig = Figure(figsize=(10, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    for column in range(trace.width):
+        idx = minmax_indices(values[:, column], max_points)
+        label = labels[column] if labels else None
+        ax.plot(times[idx], values[idx, column], linewidth=0.6, label=label)
+    ax.set_xlabel('Time [Seconds]')
+    ax.set_ylabel('Acceleration [0.01 G]')
+    ax.set_title(title)
+    if labels:
+        ax.legend(loc='upper right')
+    fig.savefig(fname, dpi=100)
+    return fname
+
+class PlotWorker(object):
+    """
+    Renders EventTraces on a background thread, one at a time.
+        - submit() queues a plot and returns straight away. If maxsize
+          plots are already waiting the new one is dropped and counted,
+          the acquisition loop never waits on plotting.
+        - close() waits for the queued plots to be written.
+    """
+
+    def __init__(self, max_points=20000, maxsize=4, labels=None):
+        self.max_points = max_points
+        self.labels = labels
+        self.queue = queue.Queue(maxsize)
+        self.rendered = 0
+        self.dropped = 0
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="plot-worker")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, trace, fname, title='Recorded Ground Motion'):
+        """
+        Queues trace to be drawn to fname. Returns False if it was dropped.
+        """
+        if not len(trace):
+            return False
+        try:
+            self.queue.put_nowait((trace, fname, title))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is _STOP:
+                return
+            trace, fname, title = job
+            try:
+                render_event(trace, fname, self.max_points, title, self.labels)
+            except Exception as e: # a bad plot mustn't take the worker down with it
+                self.error = e
+                self.dropped += 1
+            else:
+                self.rendered += 1
+                print("Plot saved to "+fname)
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+        if self.error is not None:
+            print("Plotting failed: "+str(self.error))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
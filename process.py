@@ -1,104 +1,256 @@
-"""
-Filters data
-Processes filtered data
-Send final displacements website
-"""
-# works except for conversion of timestamps to floats
-
-import csv
-import winsound
-from scipy.signal import butter, lfilter
-from scipy.fftpack import fft
-import argparse
-
-def readcsv(DATA_FILENAME):
-	# read a data file
-	with open(DATA_FILENAME,'r') as mycsvfile:
-		data = csv.reader(mycsvfile)
-		x = []; timestamp = []
-		for row in data:
-			x.append(float(row[1]))
-			timestamp.append(float(row[0]))
-	return x, timestamp
-
-def writecsv(RESULTS_FILENAME,results):
-	# save results
-	with open(RESULTS_FILENAME,'w') as file:
-		writer = csv.writer(file,lineterminator='\n')
-		for row in results:
-			writer.writerow(row)
-	print ('saved results to: ' + RESULTS_FILENAME)
-	return
-
-def butter_filter(data):
-	# uses butterworth (low/high pass) filter to filter data
-	def butter_bandpass(lowcut, highcut, fs, order):
-		nyq = 0.5*fs
-		low = lowcut/nyq;
-		high = highcut/nyq;
-		b,a = butter(order, [low,high], btype='bandpass')
-		DC = b[0]/a[0]
-		return b,a,DC
-
-	def butter_bandpass_filter(data, lowcut, highcut, fs, order,butter_bandpass):
-		b,a,DC = butter_bandpass(lowcut, highcut, fs, order)
-		y_f = lfilter (b, a, data)
-		y = y_f#*(1/DC) # Account for DC Gain [We currently do not do this-->cheating]
-		return (y)
-
-	# filter
-	l = len(data) # number of data points
-	fs = l / (data[-1] - data[0]) # sampling rate
-	print (data[0], data[-1])
-	print ('sampling rate (HZ):', fs)
-	x_fft = fft(data)
-	T = np.linspace(0.0, fs/2, l/2)
-	x_FFT_1 = 2.0/l * np.abs(x_fft[0:(l/2)])
-	ind = [i for i,v in enumerate(x_FFT_1) if v == max(x_FFT_1)]
-	Tb = T[ind]
-	print ('Tb', Tb)
-	filtered_data = butter_bandpass_filter(data, .3*Tb, 8*Tb, fs, 2, butter_bandpass) # filtered values
-	return (filtered_data)
-
-def integrate(data,timestamps):
-	# integrate data
-	int_data = []; int_data.appaned(0)
-	for i in range(1,len(data)):
-		delta = timestamps[i] - timestamps[i-1]
-		int_data.append((delta/2)*(data[i-1]+data[i])+int_data[i-1])
-	return (int_data)
-
-def post(ENDPOINT, data):
-	# send final results to website
-	return (0)
-
-def main():
-	# ~~~~~~~ OPTIONS TO CONFIGURE ~~~~~~~~~
-	endpoint = '' # web address for posting
-	data_filename = 'test_data.csv' # data file
-	results_filename = 'results.csv' # file for displacement results
-	# ~~~~~~~ ==================== ~~~~~~~~~
-	parser = argparse.ArgumentParser(description='Processes Data')
-	parser.add_argument('-e','--endpoint', help='web address for posting', required=False)
-	parser.add_argument('-df','--data_filename', help='file with raw data', required=False)
-	parser.add_argument('-rf','--results_filename', help='file for results', required=False)
-	args = vars(parser.parse_args())
-	if args['endpoint']:
-		endpoint = str(args['endpoint'])
-	if args['data_filename']:
-		endpoint = str(args['data_filename'])
-	if args['results_filename']:
-		endpoint = str(args['results_filename'])
-	# ~~~~~~~ ==================== ~~~~~~~~~
-	a, timestamp = readcsv(data_filename) # read data csv
-	af = butter_filter(a)
-	v = integrate(af,timestamps)
-	vf = butter_filter(v)
-	d = integrate(vf,timestamps)
-	writecsv(results_filename,d)
-
-	print ('final displacement', d[-1])
-	return
-
-if __name__ == "__main__":
+"""
+Filters data
+Processes filtered data
+Send final displacements website
+"""
+import csv
+import glob
+import io
+import os
+import time
+import numpy as np
+from functools import lru_cache
+import argparse
+# scipy.signal and the process pool are imported where they're used, they
+# take over a second to load on the Pi and not every run needs them
+
+def readcsv(DATA_FILENAME, even_spacing=True):
+	# read a data file of "HH:MM:SS[.ffffff],value" rows into numpy arrays
+	# returns (values, timestamps), timestamps in seconds since midnight of the
+	# first day, counting on past midnight if the recording runs over it
+	# old files only have whole second stamps; with even_spacing the samples
+	# are spread evenly over the seconds they cover so fs and integration work
+	with open(DATA_FILENAME,'r') as mycsvfile:
+		text = mycsvfile.read()
+	# "HH:MM:SS.ffffff,value" -> 4 numeric columns, parsed in one go
+	table = np.loadtxt(io.StringIO(text.replace(':', ',')), delimiter=',', ndmin=2)
+	x = table[:,3]
+	timestamp = table[:,0]*3600 + table[:,1]*60 + table[:,2]
+	rollovers = np.diff(timestamp) < -43200 # went past midnight
+	if rollovers.any():
+		timestamp[1:] += 86400*np.cumsum(rollovers)
+	whole_seconds = '.' not in text[:text.find(',')]
+	if even_spacing and whole_seconds and len(timestamp) > 1:
+		span = timestamp[-1] + 1 - timestamp[0]
+		timestamp = timestamp[0] + np.arange(len(timestamp)) * (span / len(timestamp))
+	return x, timestamp
+
+def writecsv(RESULTS_FILENAME,results,verbose=True):
+	# save results
+	with open(RESULTS_FILENAME,'w') as file:
+		writer = csv.writer(file,lineterminator='\n')
+		for row in results:
+			writer.writerow(row)
+	if verbose:
+		print ('saved results to: ' + RESULTS_FILENAME)
+	return
+
+@lru_cache(maxsize=64)
+def butter_bandpass(lowcut, highcut, fs, order):
+	# designs the bandpass once per (band, fs, order), as second-order sections
+	nyq = 0.5*fs
+	low = lowcut/nyq
+	high = min(highcut/nyq, 0.99) # keep the top of the band under nyquist
+	from scipy.signal import butter
+	sos = butter(order, [low,high], btype='bandpass', output='sos')
+	return sos
+
+class StreamingBandpass(object):
+	# butterworth bandpass that filters a chunk at a time, carrying the
+	# filter state (zi) across chunks, so filtering a recording in pieces
+	# gives the same answer as filtering it all at once
+	def __init__(self, lowcut, highcut, fs, order=2):
+		from scipy.signal import sosfilt
+		self.sos = butter_bandpass(float(lowcut), float(highcut), float(fs), order)
+		self._sosfilt = sosfilt
+		self.reset()
+
+	def reset(self):
+		self.zi = np.zeros((self.sos.shape[0], 2))
+
+	def filter(self, chunk):
+		y, self.zi = self._sosfilt(self.sos, np.asarray(chunk, dtype=float), zi=self.zi)
+		return (y)
+
+def filter_chunks(chunks, lowcut, highcut, fs, order=2):
+	# filters an iterable of chunks (e.g. blocks of a long file or a live stream)
+	bandpass = StreamingBandpass(lowcut, highcut, fs, order)
+	for chunk in chunks:
+		yield bandpass.filter(chunk)
+
+def sampling_rate(timestamps):
+	return (len(timestamps) - 1) / float(timestamps[-1] - timestamps[0])
+
+def dominant_frequency(data, fs):
+	# frequency (Hz) of the biggest peak in the spectrum, not counting DC
+	l = len(data) # number of data points
+	x_FFT_1 = 2.0/l * np.abs(np.fft.rfft(data))
+	T = np.fft.rfftfreq(l, 1.0/fs)
+	return (T[1 + np.argmax(x_FFT_1[1:])])
+
+def butter_filter(data, timestamps, order=2, chunk_size=None, verbose=True):
+	# uses butterworth bandpass filter around the dominant frequency to filter data
+	# chunk_size filters in pieces of that many samples (same result, less memory)
+	fs = sampling_rate(timestamps) # sampling rate
+	Tb = dominant_frequency(data, fs)
+	if verbose:
+		print ('sampling rate (HZ):', fs)
+		print ('Tb', Tb)
+	if not chunk_size:
+		return (StreamingBandpass(.3*Tb, 8*Tb, fs, order).filter(data)) # filtered values
+	chunks = (data[i:i+chunk_size] for i in range(0, len(data), chunk_size))
+	return (np.concatenate(list(filter_chunks(chunks, .3*Tb, 8*Tb, fs, order))))
+
+BASELINES = ('none', 'mean', 'linear')
+
+def integrate(data,timestamps,baseline='none'):
+	# integrate data: cumulative trapezoid rule over the whole array,
+	# timestamps don't need to be evenly spaced
+	# baseline: 'mean' takes out the mean of the result, 'linear' takes out
+	# a straight line fit against time (drift left over from a DC offset)
+	data = np.asarray(data, dtype=float)
+	timestamps = np.asarray(timestamps, dtype=float)
+	int_data = np.zeros(len(data))
+	if len(data) > 1:
+		np.cumsum(0.5*np.diff(timestamps)*(data[1:]+data[:-1]), out=int_data[1:])
+	if baseline == 'mean':
+		int_data -= int_data.mean()
+	elif baseline == 'linear' and len(data) > 1 and timestamps[-1] > timestamps[0]:
+		slope, intercept = np.polyfit(timestamps, int_data, 1)
+		int_data -= slope*timestamps + intercept
+	elif baseline not in BASELINES:
+		raise ValueError('unknown baseline: ' + str(baseline))
+	return (int_data)
+
+def process_file(DATA_FILENAME, baseline='none', verbose=True):
+	# the whole chain for one recording: filter -> integrate -> filter -> integrate
+	# returns (timestamps, displacement, summary dict)
+	a, timestamps = readcsv(DATA_FILENAME) # read data csv
+	af = butter_filter(a,timestamps,verbose=verbose)
+	v = integrate(af,timestamps,baseline)
+	vf = butter_filter(v,timestamps,verbose=verbose)
+	d = integrate(vf,timestamps,baseline)
+	fs = sampling_rate(timestamps)
+	summary = {
+		'file': DATA_FILENAME,
+		'samples': len(a),
+		'duration': timestamps[-1] - timestamps[0],
+		'sampling_rate': fs,
+		'dominant_frequency': dominant_frequency(a, fs),
+		'peak_displacement': np.max(np.abs(d)),
+		'final_displacement': d[-1],
+	}
+	return timestamps, d, summary
+
+SUMMARY_COLUMNS = ('file', 'samples', 'duration', 'sampling_rate', 'dominant_frequency', 'peak_displacement', 'final_displacement', 'error')
+
+def _process_one(job):
+	# worker for batch mode: process one file and write its results next to the others
+	DATA_FILENAME, RESULTS_DIR, baseline = job
+	try:
+		timestamps, d, summary = process_file(DATA_FILENAME, baseline, verbose=False)
+	except Exception as e: # one bad capture shouldn't sink the whole batch
+		return {'file': DATA_FILENAME, 'error': repr(e)}
+	name = os.path.splitext(os.path.basename(DATA_FILENAME))[0]
+	writecsv(os.path.join(RESULTS_DIR, name + '_results.csv'), zip(timestamps, d), verbose=False)
+	return summary
+
+def batch_files(patterns):
+	# directories mean every .csv in them, anything else is a glob
+	files = []
+	for pattern in patterns:
+		if os.path.isdir(pattern):
+			pattern = os.path.join(pattern, '*.csv')
+		files.extend(sorted(glob.glob(pattern)))
+	return files
+
+def process_batch(files, RESULTS_DIR, baseline='none', jobs=None):
+	# fans process_file out over a pool of processes, one file per task
+	# writes <name>_results.csv for every file and summary.csv, returns the summaries
+	if not os.path.isdir(RESULTS_DIR):
+		os.makedirs(RESULTS_DIR)
+	from concurrent.futures import ProcessPoolExecutor
+	start = time.perf_counter()
+	with ProcessPoolExecutor(max_workers=jobs) as pool:
+		summaries = list(pool.map(_process_one, [(f, RESULTS_DIR, baseline) for f in files]))
+	elapsed = time.perf_counter() - start
+	writecsv(os.path.join(RESULTS_DIR, 'summary.csv'),
+		[SUMMARY_COLUMNS] + [[summary.get(c, '') for c in SUMMARY_COLUMNS] for summary in summaries])
+	print ('%-40s %8s %9s %9s %12s' % ('file', 'samples', 'duration', 'dom (Hz)', 'peak disp'))
+	for summary in summaries:
+		if 'error' in summary:
+			print ('%-40s failed: %s' % (os.path.basename(summary['file']), summary['error']))
+		else:
+			print ('%-40s %8d %9.2f %9.3f %12.6g' % (os.path.basename(summary['file']), summary['samples'],
+				summary['duration'], summary['dominant_frequency'], summary['peak_displacement']))
+	print ('processed %d files in %.2f s (%.1f files/s)' % (len(files), elapsed, len(files)/elapsed if elapsed else 0.0))
+	return summaries
+
+_uploaders = {} # one background uploader per (endpoint, spool directory), see uploader.py
+
+def post(ENDPOINT, data, spool_dir=None):
+	# send final results to website: spools data and returns straight away,
+	# a background thread sends it in batches, retrying until the site has it
+	# returns the spool file name
+	from uploader import Uploader, SPOOL_DIR
+	key = (ENDPOINT, spool_dir or SPOOL_DIR)
+	if key not in _uploaders:
+		_uploaders[key] = Uploader(*key)
+	return (_uploaders[key].post(data))
+
+def finish_posting(timeout=30.0, verbose=True):
+	# gives the uploaders up to timeout seconds to send what's spooled,
+	# whatever is left goes out the next time we post
+	for key, uploader in list(_uploaders.items()):
+		sent = uploader.flush(timeout)
+		uploader.close(1.0)
+		if verbose:
+			print ('posting to ' + uploader.endpoint + (' done' if sent else ' unfinished, the rest is spooled in ' + uploader.spool_dir))
+			uploader.print_stats()
+		del _uploaders[key]
+
+def main():
+	# ~~~~~~~ OPTIONS TO CONFIGURE ~~~~~~~~~
+	endpoint = '' # web address for posting
+	data_filename = 'test_data.csv' # data file
+	results_filename = 'results.csv' # file for displacement results
+	results_dir = 'results' # directory for batch results
+	# ~~~~~~~ ==================== ~~~~~~~~~
+	parser = argparse.ArgumentParser(description='Processes Data')
+	parser.add_argument('-e','--endpoint', help='web address for posting', required=False)
+	parser.add_argument('-df','--data_filename', help='file with raw data', required=False)
+	parser.add_argument('-rf','--results_filename', help='file for results', required=False)
+	parser.add_argument('-bl','--baseline', help='baseline correction after each integration', choices=BASELINES, default='none')
+	parser.add_argument('-b','--batch', nargs='+', help='directories or globs of recordings to process in parallel', required=False)
+	parser.add_argument('-o','--outdir', help='directory for batch results (default: results)', required=False)
+	parser.add_argument('-sp','--spool', help='directory results wait in until posted (default: spool)', required=False)
+	parser.add_argument('-j','--jobs', type=int, help='worker processes for batch mode (default: one per CPU)', required=False)
+	args = vars(parser.parse_args())
+	if args['endpoint']:
+		endpoint = str(args['endpoint'])
+	if args['data_filename']:
+		data_filename = str(args['data_filename'])
+	if args['results_filename']:
+		results_filename = str(args['results_filename'])
+	if args['outdir']:
+		results_dir = str(args['outdir'])
+	# ~~~~~~~ ==================== ~~~~~~~~~
+	if args['batch']:
+		summaries = process_batch(batch_files(args['batch']), results_dir, args['baseline'], args['jobs'])
+		if endpoint:
+			for summary in summaries:
+				if 'error' not in summary:
+					post(endpoint, summary, args['spool'])
+			finish_posting()
+		return
+	timestamps, d, summary = process_file(data_filename, args['baseline'])
+	writecsv(results_filename,zip(timestamps,d))
+
+	print ('final displacement', d[-1])
+	if endpoint:
+		post(endpoint, summary, args['spool'])
+		finish_posting()
+	return
+
+if __name__ == "__main__":
 	main()
\ No newline at end of file
@@ -0,0 +1,336 @@
+"""
+Recording file formats.
+
+Recordings are rows of (time, value, ...) with one value per channel,
+each the ADC reading minus that channel's mean. The acquisition loop
+stamps rows with time.perf_counter_ns(), which is cheap and never goes
+backwards, and gives the writer a ClockAnchor taken once per event to
+turn them into wall-clock time when they're written out. Two formats:
+    - CSV (.csv): "HH:MM:SS.ffffff,value[,value...]" rows, what we've
+      always written (one channel = the usual two columns).
+    - Binary (.bin): a 64 byte header followed by fixed-width records,
+        <f8 t      seconds since the header's start time
+        <f4 value  reading minus mean, once per channel
+      12 bytes a sample instead of ~30 for one channel, and it can be
+      memory-mapped straight into a NumPy structured array.
+
+Header layout (little endian):
+    8s magic "PESESBIN", H version, H flags, h channel, 2x,
+    d rate (samples/second, 0 if unknown), d mean, d start,
+    B number of channels (0 means 1), 8s channel numbers, 15x
+start is the wall-clock time of the first sample in epoch seconds, or
+seconds since midnight when FLAG_CLOCK_OF_DAY is set (files converted
+from CSV, which never recorded the date). channel and mean are those of
+the first channel; with more than one channel the header is followed by
+one <f8 mean per channel before the records start.
+
+Writers keep one buffered handle for the whole recording. New
+recordings are written to <name>.part and renamed to <name> by close(),
+so a file under its real name is always a complete recording; after a
+crash the .part file holds everything up to the last fsync.
+
+Run as a script to bulk convert CSVs:
+    python recording.py saved_CSVs/*.csv -o saved_BINs
+"""
+import argparse
+import csv
+import os
+import struct
+import time
+from datetime import datetime
+
+from replay import parse_clock
+
+MAGIC = b"PESESBIN"
+VERSION = 1
+FLAG_CLOCK_OF_DAY = 0x1
+HEADER = struct.Struct("<8sHHh2xdddB8s15x")
+RECORD_DTYPE = [("t", "<f8"), ("value", "<f4")]
+MAX_CHANNELS = 8
+PART_SUFFIX = ".part"
+FILE_BUFFER = 1 << 16 # bytes buffered in memory between writes to the card
+
+def record_struct(num_channels):
+    return struct.Struct("<d" + "f" * num_channels)
+
+def record_dtype(num_channels):
+    # one channel keeps "value" 1-D, more make it (count, num_channels)
+    if num_channels == 1:
+        return RECORD_DTYPE
+    return [("t", "<f8"), ("value", "<f4", (num_channels,))]
+
+def timestamp_at(t):
+    return datetime.fromtimestamp(t).strftime("%H:%M:%S.%f")
+
+class ClockAnchor(object):
+    """
+    Ties row times to the wall clock: epoch is the wall-clock time in
+    seconds at the moment the row clock read zero, scale converts row
+    clock units to seconds. The default reads rows as time.time() stamps;
+    ClockAnchor.now() reads them as time.perf_counter_ns().
+    """
+    __slots__ = ("epoch", "zero", "scale")
+
+    def __init__(self, epoch=0.0, zero=0, scale=1.0):
+        self.epoch = epoch
+        self.zero = zero
+        self.scale = scale
+
+    @classmethod
+    def now(cls):
+        zero = time.perf_counter_ns()
+        wall = time.time_ns()
+        return cls(wall / 1e9, zero, 1e-9)
+
+    def wall(self, t):
+        """
+        Epoch seconds at row time t.
+        """
+        return self.epoch + (t - self.zero) * self.scale
+
+WALL_CLOCK = ClockAnchor()
+
+def row_builder(mean):
+    """
+    Returns f(t, reading) -> recording row, taking the mean off each
+    channel. mean is a number for one channel, or a sequence of them.
+    """
+    if not hasattr(mean, "__len__"):
+        return lambda t, value: (t, value - mean)
+    means = tuple(mean)
+    return lambda t, values: (t,) + tuple([v - m for v, m in zip(values, means)])
+
+# ~~~~~~~ Writers ~~~~~~~~~~~~~
+# Both take rows of (time, value, ...) through write_rows() and must be close()d.
+# anchor (a ClockAnchor) says what the times are, time.time() stamps by default.
+
+def fsync_dir(path):
+    """
+    fsyncs the directory holding path, so a rename in it survives a power cut.
+    """
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError: # not something we can open on this platform
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class RecordingFile(object):
+    """
+    The file handling both writers share.
+        - mode "w" writes to fname + PART_SUFFIX and close() renames it to
+          fname once everything is on disk; atomic=False writes fname
+          directly. Mode "a" always appends to fname in place.
+        - sync() flushes and fsyncs if sync_every seconds have gone by
+          since the last fsync (0 every time, None only on close()).
+          Otherwise it leaves the buffered handle alone, so writes reach
+          the card FILE_BUFFER bytes at a time.
+        - close() doesn't raise on I/O errors (a full or pulled card), it
+          keeps the first one in self.error. A recording that had an
+          error, or is closed with complete=False, isn't renamed: what
+          made it to disk stays in self.path, the .part file.
+    """
+
+    def _open(self, fname, mode, atomic, sync_every, binary, anchor):
+        self.fname = fname
+        self.anchor = anchor or WALL_CLOCK
+        self.sync_every = sync_every
+        self.syncs = 0
+        self.error = None
+        self._last_sync = time.monotonic()
+        self.path = fname + PART_SUFFIX if (atomic and mode == "w") else fname
+        if binary:
+            self._file = open(self.path, mode + "b", buffering=FILE_BUFFER)
+        else:
+            self._file = open(self.path, mode, newline='', buffering=FILE_BUFFER)
+
+    def flush(self):
+        self._file.flush()
+
+    def fsync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.syncs += 1
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        if self.sync_every is not None and time.monotonic() - self._last_sync >= self.sync_every:
+            self.fsync()
+
+    def close(self, complete=True):
+        if self._file.closed:
+            return
+        if self.error is None:
+            try:
+                self.fsync()
+            except (IOError, OSError) as e:
+                self.error = e
+        try:
+            self._file.close() # closes the handle even when its last flush fails
+        except (IOError, OSError) as e:
+            if self.error is None:
+                self.error = e
+        if complete and self.error is None and self.path != self.fname:
+            try:
+                os.replace(self.path, self.fname)
+                fsync_dir(self.fname)
+            except (IOError, OSError) as e:
+                self.error = e
+
+class CsvRecordingWriter(RecordingFile):
+
+    def __init__(self, fname, mode="w", atomic=True, sync_every=None, anchor=None):
+        self._open(fname, mode, atomic, sync_every, False, anchor)
+        self._writer = csv.writer(self._file)
+
+    def write_rows(self, rows):
+        wall = self.anchor.wall
+        self._writer.writerows([timestamp_at(wall(row[0]))] + list(row[1:]) for row in rows)
+
+def pack_header(flags, channels, rate, means, start):
+    header = HEADER.pack(MAGIC, VERSION, flags, channels[0], rate or 0.0, means[0], start,
+                         len(channels), bytes(channels))
+    if len(channels) > 1:
+        header += struct.pack("<%dd" % len(channels), *means)
+    return header
+
+class BinaryRecordingWriter(RecordingFile):
+    """
+    Appending (mode "a") to an existing recording keeps its header,
+    otherwise a header is written using rate, mean and channels. mean is
+    a number, or one per channel. The start time is taken from the first
+    sample written. Record times are counted from the first sample in
+    row clock units, so they are as exact as the clock the rows came from.
+    """
+
+    def __init__(self, fname, mode="w", rate=None, mean=0.0, channels=(0,), atomic=True, sync_every=None, anchor=None):
+        channels = list(channels)
+        if not 0 < len(channels) <= MAX_CHANNELS:
+            raise ValueError("Need 1 to " + str(MAX_CHANNELS) + " channels, got " + str(channels))
+        self.start = None
+        self._first = None # row time of self.start
+        means = list(mean) if hasattr(mean, "__len__") else [mean] * len(channels)
+        self._header = (rate, means, channels)
+        self._record = record_struct(len(channels))
+        self._open(fname, mode, atomic, sync_every, True, anchor)
+        if mode == "a" and os.path.exists(fname) and os.path.getsize(fname) >= HEADER.size:
+            self.start = read_header(fname)["start"]
+            # the row time the existing header's start corresponds to
+            self._first = self.anchor.zero + (self.start - self.anchor.epoch) / self.anchor.scale
+
+    def write_rows(self, rows):
+        out = bytearray()
+        pack = self._record.pack
+        if self._first is None and rows:
+            self._first = rows[0][0]
+            self.start = self.anchor.wall(self._first)
+            rate, means, channels = self._header
+            self._file.write(pack_header(0, channels, rate, means, self.start))
+        first = self._first
+        scale = self.anchor.scale
+        for row in rows:
+            out += pack((row[0] - first) * scale, *row[1:])
+        self._file.write(out)
+
+def open_recording(fname, mode="w", rate=None, mean=0.0, channels=(0,), atomic=True, sync_every=None, anchor=None):
+    """
+    Picks the writer from the file extension: .bin is binary, anything else CSV.
+    """
+    if fname.endswith(".bin"):
+        return BinaryRecordingWriter(fname, mode, rate, mean, channels, atomic, sync_every, anchor)
+    return CsvRecordingWriter(fname, mode, atomic, sync_every, anchor)
+
+# ~~~~~~~ Readers ~~~~~~~~~~~~~
+
+def read_header(fname):
+    with open(fname, "rb") as f:
+        raw = f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            raise ValueError(fname + " is too short to be a binary recording")
+        magic, version, flags, channel, rate, mean, start, num_channels, channel_bytes = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError(fname + " is not a binary recording")
+        if version != VERSION:
+            raise ValueError(fname + " is version " + str(version) + ", we only read " + str(VERSION))
+        num_channels = num_channels or 1
+        if num_channels > 1:
+            channels = list(channel_bytes[:num_channels])
+            means = list(struct.unpack("<%dd" % num_channels, f.read(8 * num_channels)))
+        else:
+            channels = [channel]
+            means = [mean]
+    data_offset = HEADER.size + (8 * num_channels if num_channels > 1 else 0)
+    count = (os.path.getsize(fname) - data_offset) // record_struct(num_channels).size
+    return {"version": version, "flags": flags, "channel": channel, "channels": channels,
+            "rate": rate or None, "mean": mean, "means": means, "start": start,
+            "count": count, "data_offset": data_offset}
+
+def read_recording(fname, mmap=True):
+    """
+    Returns (header dict, records), where records is a NumPy structured
+    array with "t" and "value" fields, memory-mapped unless mmap=False.
+    """
+    import numpy as np
+    header = read_header(fname)
+    dtype = record_dtype(len(header["channels"]))
+    if mmap:
+        records = np.memmap(fname, dtype=dtype, mode="r", offset=header["data_offset"], shape=(header["count"],))
+    else:
+        records = np.fromfile(fname, dtype=dtype, offset=header["data_offset"], count=header["count"])
+    return header, records
+
+# ~~~~~~~ CSV -> binary conversion ~~~~~~~~~~~~~
+
+def convert_csv(csv_name, bin_name, channels=None):
+    """
+    Converts one of our CSV recordings. Handles both "HH:MM:SS" and
+    "HH:MM:SS.ffffff" stamps, recordings that run past midnight and wide
+    (multi-channel) CSVs, which are taken to be channels 0, 1, ... unless
+    channels says otherwise. The rate is estimated from the first and
+    last timestamps. Returns the number of samples converted.
+    """
+    times = []
+    rows = []
+    rollover = 0.0
+    last = None
+    with open(csv_name, newline='') as csv_file:
+        for row in csv.reader(csv_file):
+            if not row:
+                continue
+            t = parse_clock(row[0])
+            if last is not None and t + rollover < last - 43200: # went past midnight
+                rollover += 86400
+            last = t + rollover
+            times.append(last)
+            rows.append([float(v) for v in row[1:]])
+    if not times:
+        raise ValueError(csv_name + " has no samples")
+    num_channels = len(rows[0])
+    channels = list(channels or range(num_channels))
+    start = times[0]
+    span = times[-1] - start
+    rate = (len(times) - 1) / span if span > 0 else 0.0
+    pack = record_struct(num_channels).pack
+    with open(bin_name, "wb") as f:
+        f.write(pack_header(FLAG_CLOCK_OF_DAY, channels, rate, [0.0] * num_channels, start))
+        f.write(b"".join(pack(t - start, *values) for t, values in zip(times, rows)))
+    return len(times)
+
+def main():
+    parser = argparse.ArgumentParser(description='Converts CSV recordings to the binary recording format')
+    parser.add_argument('csvs', nargs='+', help='CSV files to convert.')
+    parser.add_argument('-o','--outdir', help='Directory to write .bin files to. Defaults to next to each CSV.', required=False)
+    args = vars(parser.parse_args())
+    if args['outdir'] and not os.path.isdir(args['outdir']):
+        os.makedirs(args['outdir'])
+    for csv_name in args['csvs']:
+        base = os.path.splitext(os.path.basename(csv_name))[0] + ".bin"
+        bin_name = os.path.join(args['outdir'] or os.path.dirname(csv_name), base)
+        count = convert_csv(csv_name, bin_name)
+        print("%s -> %s (%d samples, %d -> %d bytes)" % (csv_name, bin_name, count,
+                                                        os.path.getsize(csv_name), os.path.getsize(bin_name)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Replays a recorded CSV (timestamp, value) as if it were the ADC.
+The file is opened once and rows are streamed lazily, so a replay
+runs in linear time no matter how big the recording is.
+"""
+import csv
+import time
+
+def parse_clock(stamp):
+    """
+    Turns "HH:MM:SS" or "HH:MM:SS.ffffff" into seconds since midnight.
+    """
+    hours, minutes, seconds = stamp.split(":")
+    return int(hours)*3600 + int(minutes)*60 + float(seconds)
+
+class CsvReplaySource(object):
+    """
+    Sample source that reads one value per call from a saved CSV.
+    With throttle=True, read() waits so that samples come out at the
+    rate they were recorded at; otherwise it runs as fast as possible.
+    Raises EOFError once the recording runs out.
+    channels and typecode make it an acquisition sample source.
+    """
+    channels = [0]
+    typecode = 'd'
+
+    def __init__(self, fname, throttle=False, verbose=True):
+        self.fname = fname
+        self.throttle = throttle
+        self.verbose = verbose
+        self.current_row = 0
+        self._file = open(fname, newline='')
+        self._rows = csv.reader(self._file)
+        self._first_stamp = None
+        self._last_stamp = None
+        self._rollover = 0.0
+        self._start = None
+
+    def read(self):
+        for row in self._rows:
+            if row:
+                break
+        else:
+            self.close()
+            raise EOFError("replay of " + self.fname + " finished after " + str(self.current_row) + " rows")
+        self.current_row += 1
+        if self.verbose and (self.current_row % 100 == 0):
+            print("now reading: " + str(self.current_row))
+        if self.throttle:
+            self._wait_for(row[0])
+        return float(row[1])
+
+    def _wait_for(self, stamp):
+        # sleep until the recorded offset of this row has elapsed
+        recorded = parse_clock(stamp)
+        if self._first_stamp is None:
+            self._first_stamp = recorded
+            self._last_stamp = recorded
+            self._start = time.monotonic()
+            return
+        if recorded < self._last_stamp - 43200: # went past midnight
+            self._rollover += 86400
+        self._last_stamp = recorded
+        delay = (recorded + self._rollover - self._first_stamp) - (time.monotonic() - self._start)
+        if delay > 0:
+            time.sleep(delay)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.read()
+            except EOFError:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
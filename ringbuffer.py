@@ -0,0 +1,161 @@
+"""
+Fixed-size ring of (time, value) samples for the pre-trigger window.
+Storage is allocated once as two flat arrays, so pushing a sample
+never allocates and memory stays bounded however long we wait:
+a 5 minute window at 1 kHz is 300000 samples, about 3 MB.
+"""
+from array import array
+
+def _copy_views(views, time_code, value_code):
+    times = array(time_code)
+    values = array(value_code)
+    for t, v in views:
+        times.frombytes(t.cast('B'))
+        values.frombytes(v.cast('B'))
+    return times, values
+
+class SampleRing(object):
+    """
+    Holds the last `size` samples.
+        - times are int64, the nanosecond clock readings the loop takes
+          (time.perf_counter_ns()).
+        - values default to int16, which fits raw MCP3008 counts; pass
+          typecode='d' for float values, e.g. when replaying a CSV.
+    views() hands back memoryviews of the storage, oldest sample first,
+    so saving the buffer doesn't copy it.
+    """
+    __slots__ = ("size", "times", "values", "index", "count")
+
+    def __init__(self, size, typecode='h'):
+        if size < 1:
+            raise ValueError("Ring size must be at least 1, got " + str(size))
+        self.size = size
+        self.times = array('q', bytes(8 * size))
+        self.values = array(typecode, [0]) * size
+        self.index = 0 # where the next sample goes
+        self.count = 0 # how many slots hold real samples
+
+    def append(self, t, value):
+        i = self.index
+        self.times[i] = t
+        self.values[i] = value
+        i += 1
+        if i == self.size:
+            i = 0
+        self.index = i
+        if self.count < self.size:
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+    def views(self):
+        """
+        List of (times, values) memoryview pairs that together cover the
+        buffer in order, oldest first. At most two pairs, since the
+        oldest samples may wrap around the end of the storage.
+        """
+        times = memoryview(self.times)
+        values = memoryview(self.values)
+        if self.count < self.size:
+            return [(times[:self.count], values[:self.count])]
+        i = self.index
+        return [(times[i:], values[i:]), (times[:i], values[:i])]
+
+    def snapshot(self):
+        """
+        Copy of the ring, oldest sample first, that another thread can
+        save while this one keeps appending. Only for reading: its
+        storage is copied out of views(), nothing is done per sample.
+        """
+        copy = SampleRing.__new__(SampleRing)
+        copy.times, copy.values = _copy_views(self.views(), self.times.typecode, self.values.typecode)
+        copy.size = copy.count = self.count
+        copy.index = 0
+        return copy
+
+    def __iter__(self):
+        for times, values in self.views():
+            for pair in zip(times, values):
+                yield pair
+
+    def rows(self):
+        """
+        (time, value) pairs, oldest first.
+        """
+        return iter(self)
+
+class MultiSampleRing(object):
+    """
+    SampleRing for several channels read together: every slot holds one
+    time and `width` values, stored row after row in one flat array.
+    append() takes the values as a sequence; rows() yields (time, tuple).
+    """
+    __slots__ = ("size", "width", "times", "values", "index", "count")
+
+    def __init__(self, size, width, typecode='h'):
+        if size < 1 or width < 1:
+            raise ValueError("Ring size and width must be at least 1, got " + str((size, width)))
+        self.size = size
+        self.width = width
+        self.times = array('q', bytes(8 * size))
+        self.values = array(typecode, [0]) * (size * width)
+        self.index = 0
+        self.count = 0
+
+    def append(self, t, values):
+        i = self.index
+        self.times[i] = t
+        j = i * self.width
+        for value in values:
+            self.values[j] = value
+            j += 1
+        i += 1
+        if i == self.size:
+            i = 0
+        self.index = i
+        if self.count < self.size:
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+
+    def views(self):
+        """
+        Like SampleRing.views(), except each values view is flat: `width`
+        values per time.
+        """
+        times = memoryview(self.times)
+        values = memoryview(self.values)
+        w = self.width
+        if self.count < self.size:
+            return [(times[:self.count], values[:self.count * w])]
+        i = self.index
+        return [(times[i:], values[i * w:]), (times[:i], values[:i * w])]
+
+    def snapshot(self):
+        """
+        Like SampleRing.snapshot().
+        """
+        copy = MultiSampleRing.__new__(MultiSampleRing)
+        copy.times, copy.values = _copy_views(self.views(), self.times.typecode, self.values.typecode)
+        copy.size = copy.count = self.count
+        copy.width = self.width
+        copy.index = 0
+        return copy
+
+    def rows(self):
+        w = self.width
+        for times, values in self.views():
+            for k in range(len(times)):
+                yield times[k], tuple(values[k * w:(k + 1) * w])
+
+    __iter__ = rows
@@ -0,0 +1,109 @@
+"""
+Fixed-rate sampling.
+Instead of sleeping a fixed amount after each read (which lets the read
+and the CSV write stretch every period), samples are taken against
+absolute monotonic deadlines start + k/rate, so errors never pile up.
+"""
+import math
+import time
+
+class SampleScheduler(object):
+    """
+    Call wait() right before every read.
+        - rate is in samples/second; rate=None means don't wait at all.
+        - If we're more than a whole period late, that's an overrun. With
+          skip_missed=True the missed slots are dropped so the following
+          samples land back on the grid; otherwise we read back-to-back
+          until we've caught up.
+        - spin is how long (seconds) to busy-wait before each deadline
+          instead of sleeping, for tighter timing at the cost of CPU.
+    """
+
+    def __init__(self, rate, skip_missed=True, spin=0.0, clock=time.perf_counter, sleep=time.sleep):
+        if rate is not None and rate <= 0:
+            raise ValueError("Sample rate must be positive, got " + str(rate))
+        self.rate = rate
+        self.period = 1.0 / rate if rate else 0.0
+        self.skip_missed = skip_missed
+        self.spin = spin
+        self.clock = clock
+        self.sleep = sleep
+        self.reset()
+
+    def reset(self):
+        self.start_time = None
+        self.slot = 0
+        self.samples = 0
+        self.overruns = 0
+        self.missed_slots = 0
+        # running lateness stats (Welford), in seconds
+        self.late_mean = 0.0
+        self._late_m2 = 0.0
+        self.late_max = 0.0
+
+    def wait(self):
+        """
+        Blocks until the next sample is due and returns its deadline.
+        """
+        now = self.clock()
+        if self.start_time is None:
+            self.start_time = now
+        if not self.rate:
+            self.samples += 1
+            return now
+        deadline = self.start_time + self.slot * self.period
+        if now - deadline > self.period:
+            self.overruns += 1
+            if self.skip_missed:
+                behind = int((now - deadline) / self.period)
+                self.missed_slots += behind
+                self.slot += behind
+                deadline += behind * self.period
+        else:
+            if deadline - now > self.spin:
+                self.sleep(deadline - now - self.spin)
+            now = self.clock()
+            while now < deadline:
+                now = self.clock()
+        self.slot += 1
+        self._record_lateness(now - deadline)
+        return deadline
+
+    def _record_lateness(self, late):
+        self.samples += 1
+        delta = late - self.late_mean
+        self.late_mean += delta / self.samples
+        self._late_m2 += delta * (late - self.late_mean)
+        if late > self.late_max:
+            self.late_max = late
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return self.clock() - self.start_time
+
+    def stats(self):
+        """
+        Dict of how well we kept to the schedule. Times are in seconds.
+        """
+        jitter = math.sqrt(self._late_m2 / self.samples) if self.samples > 1 else 0.0
+        elapsed = self.elapsed()
+        return {
+            "target_rate": self.rate,
+            "achieved_rate": self.samples / elapsed if elapsed > 0 else 0.0,
+            "samples": self.samples,
+            "overruns": self.overruns,
+            "missed_slots": self.missed_slots,
+            "mean_lateness": self.late_mean,
+            "max_lateness": self.late_max,
+            "jitter": jitter,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("  Target rate     : "+str(stats["target_rate"])+" samples/second")
+        print("  Achieved rate   : "+str(stats["achieved_rate"])+" samples/second")
+        print("  Overruns        : "+str(stats["overruns"])+" ("+str(stats["missed_slots"])+" slots skipped)")
+        print("  Mean lateness   : "+str(stats["mean_lateness"]*1e6)+" us")
+        print("  Max lateness    : "+str(stats["max_lateness"]*1e6)+" us")
+        print("  Jitter (stdev)  : "+str(stats["jitter"]*1e6)+" us")
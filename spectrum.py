@@ -0,0 +1,144 @@
+"""
+Live spectrum of the signal while an event is being recorded.
+process.butter_filter finds the dominant frequency with one FFT over the
+whole recording after the fact. SpectralMonitor keeps a sliding DFT of
+the last `window` seconds instead, updated as rows come in, so the
+dominant frequency and the energy in the filter band are known while
+the table is still shaking.
+    - Rows are first averaged down in blocks (decimation) to about
+      4 * max_frequency samples/second, so most rows cost one add.
+    - Each decimated sample updates only the bins up to max_frequency:
+      X_k <- (X_k + new - old) * e^(2 pi i k / N). Memory is the window
+      of decimated samples and the bins, allocated up front.
+"""
+from array import array
+import cmath
+import math
+
+# process.butter_filter filters from LOW_FACTOR to HIGH_FACTOR times the dominant frequency
+LOW_FACTOR = 0.3
+HIGH_FACTOR = 8.0
+
+class SpectralMonitor(object):
+    """
+    Sliding DFT over rows of (time, value, ...) with `width` values,
+    fed with add(row) like plotting.EventTrace. With several channels
+    the power spectra are summed, so there is one dominant frequency
+    for the whole event.
+    add() returns True every report_every seconds of rows, when it's a
+    good time to print summary().
+    """
+
+    def __init__(self, rate, width=1, window=4.0, max_frequency=25.0, report_every=1.0):
+        if not rate or rate <= 0:
+            raise ValueError("The spectrum needs the sample rate, got " + str(rate))
+        self.width = width
+        self.decimation = max(int(rate / (4.0 * max_frequency)), 1)
+        self.rate = rate / float(self.decimation) # of the decimated samples
+        self.size = max(int(window * self.rate), 8)
+        self.resolution = self.rate / self.size # Hz between bins
+        self.num_bins = max(min(int(max_frequency / self.resolution), self.size // 2), 1) # bins 1..num_bins, no DC
+        self.twiddles = [cmath.exp(2j * math.pi * k / self.size) for k in range(1, self.num_bins + 1)]
+        self.history = array('d', bytes(8 * self.size * width))
+        self.bins = [[0j] * self.num_bins for c in range(width)]
+        self.sums = [0.0] * width
+        self.report_every = max(int(report_every * self.rate), 1)
+        self.reset()
+
+    def reset(self):
+        for k in range(len(self.history)):
+            self.history[k] = 0.0
+        for c in range(self.width):
+            self.bins[c][:] = [0j] * self.num_bins
+            self.sums[c] = 0.0
+        self.index = 0 # next slot in the window
+        self.count = 0 # rows in the current block
+        self.pushed = 0 # decimated samples so far
+
+    def add(self, row):
+        if self.width == 1:
+            self.sums[0] += row[1]
+        else:
+            sums = self.sums
+            for c in range(self.width):
+                sums[c] += row[c + 1]
+        self.count += 1
+        if self.count < self.decimation:
+            return False
+        self._push()
+        return self.pushed % self.report_every == 0
+
+    def _push(self):
+        scale = 1.0 / self.decimation
+        j = self.index * self.width
+        twiddles = self.twiddles
+        for c in range(self.width):
+            x = self.sums[c] * scale
+            delta = x - self.history[j + c]
+            self.history[j + c] = x
+            self.bins[c] = [(b + delta) * w for b, w in zip(self.bins[c], twiddles)]
+            self.sums[c] = 0.0
+        self.count = 0
+        self.index += 1
+        if self.index == self.size:
+            self.index = 0
+        self.pushed += 1
+
+    def power(self):
+        """
+        Power of bins 1..num_bins, summed over the channels.
+        """
+        power = [0.0] * self.num_bins
+        for bins in self.bins:
+            for k, b in enumerate(bins):
+                power[k] += b.real * b.real + b.imag * b.imag
+        return power
+
+    def dominant_frequency(self):
+        """
+        Frequency (Hz) of the biggest peak, between bins by fitting a
+        parabola through it and its neighbours. None before any shaking.
+        """
+        power = self.power()
+        k = max(range(self.num_bins), key=power.__getitem__)
+        if not power[k]:
+            return None
+        offset = 0.0
+        if 0 < k < self.num_bins - 1:
+            left, mid, right = (math.sqrt(p) for p in power[k - 1:k + 2])
+            denom = left - 2.0 * mid + right
+            if denom:
+                offset = 0.5 * (left - right) / denom
+        return (k + 1 + offset) * self.resolution
+
+    def band_energy(self, low=0.0, high=float("inf")):
+        """
+        Mean square (counts**2) of the window between low and high Hz.
+        """
+        norm = 2.0 / (self.size * self.size)
+        power = self.power()
+        total = 0.0
+        for k in range(self.num_bins):
+            if low <= (k + 1) * self.resolution <= high:
+                total += power[k]
+        return total * norm
+
+    def band(self):
+        """
+        The (low, high) Hz band process.butter_filter would pick for the
+        dominant frequency so far, or None.
+        """
+        dominant = self.dominant_frequency()
+        if dominant is None:
+            return None
+        return (LOW_FACTOR * dominant, HIGH_FACTOR * dominant)
+
+    def summary(self):
+        band = self.band()
+        if band is None:
+            return "Spectrum: no shaking yet"
+        energy = self.band_energy(*band)
+        total = self.band_energy()
+        return "Spectrum: dominant %.2f Hz, %.2f-%.1f Hz band %.3g counts^2 (%.0f%% of the window up to %.0f Hz)" % (
+            self.dominant_frequency(), band[0], band[1], energy, 100.0 * energy / total if total else 0.0,
+            self.num_bins * self.resolution)
@@ -0,0 +1,252 @@
+"""
+Event triggers. Each one is fed every reading through update(value),
+which returns True while an event is going on. run_until_threshold
+waits for it to turn True, record_data records until it turns False.
+
+Triggers measure against a baseline.BaselineTracker. They keep feeding
+it quiet readings and freeze it for the length of each event.
+
+With several channels, AnyChannelTrigger and MagnitudeTrigger take a
+sequence of readings per update instead of one.
+"""
+import math
+from array import array
+
+TRIGGERS = ("stalta", "threshold")
+CHANNEL_MODES = ("any", "magnitude")
+
+def magnitude(baselines, values):
+    """
+    Length of the vector of values, each taken off its own baseline's mean.
+    """
+    total = 0.0
+    for b, value in zip(baselines, values):
+        diff = value - b.mean
+        total += diff * diff
+    return math.sqrt(total)
+
+class ThresholdTrigger(object):
+    """
+    The original rule: an event starts as soon as one reading is more than
+    tolerance away from the baseline, and ends after more than end_tolerance
+    readings in a row each changed less than tolerance from the one before.
+    With sigmas set, the tolerance is that many baseline standard deviations
+    (taken when the event starts, and at least 1 count) instead of a
+    fixed number of counts.
+    """
+    __slots__ = ("baseline", "tolerance", "end_tolerance", "sigmas", "active_tolerance",
+                 "triggered", "last", "num_without_change")
+
+    def __init__(self, baseline, tolerance=5, end_tolerance=5, sigmas=None):
+        self.baseline = baseline
+        self.tolerance = tolerance
+        self.end_tolerance = end_tolerance
+        self.sigmas = sigmas
+        self.reset()
+
+    @property
+    def mean(self):
+        return self.baseline.mean
+
+    def reset(self):
+        self.triggered = False
+        self.last = None
+        self.num_without_change = 0
+        self.active_tolerance = self.tolerance
+        self.baseline.unfreeze()
+
+    def update(self, value):
+        if not self.triggered:
+            if self.sigmas is not None:
+                # never tighter than one ADC count, or a dead quiet signal trips on anything
+                self.active_tolerance = max(self.sigmas * self.baseline.std, 1.0)
+            if abs(value - self.baseline.mean) > self.active_tolerance:
+                self.triggered = True
+                self.num_without_change = 0
+                self.baseline.freeze()
+            else:
+                self.baseline.update(value)
+        else:
+            if abs(value - self.last) < self.active_tolerance:
+                self.num_without_change += 1
+            else:
+                self.num_without_change = 0
+            if self.num_without_change > self.end_tolerance:
+                self.triggered = False
+                self.baseline.unfreeze()
+        self.last = value
+        return self.triggered
+
+class StaLtaTrigger(object):
+    """
+    Short-term average / long-term average trigger on the signal energy
+    (value - baseline mean)**2. Turns on when STA/LTA goes over on_ratio and off when
+    it drops under off_ratio. A lone spike barely moves the STA, so it
+    takes sustained shaking to trigger.
+        - sta and lta are window lengths in samples.
+        - Nothing triggers until the LTA window has filled once.
+        - The LTA is frozen during an event so the end of the event is
+          judged against the quiet before it.
+        - min_lta stops a perfectly flat signal (LTA of 0) from turning
+          every little blip into an infinite ratio.
+    Both averages are running sums over preallocated windows, so each
+    update is constant time (amortized: each sum is recomputed exactly
+    once per lap of its window).
+    """
+    __slots__ = ("baseline", "nsta", "nlta", "on_ratio", "off_ratio", "min_lta", "triggered", "ratio",
+                 "_sta_window", "_lta_window", "_sta_index", "_lta_index", "_sta_sum", "_lta_sum", "_count")
+
+    def __init__(self, baseline, sta=50, lta=1000, on_ratio=4.0, off_ratio=1.5, min_lta=1.0):
+        if not 0 < sta < lta:
+            raise ValueError("Need 0 < sta < lta, got sta=" + str(sta) + " lta=" + str(lta))
+        if off_ratio > on_ratio:
+            raise ValueError("off_ratio can't be bigger than on_ratio")
+        self.baseline = baseline
+        self.nsta = sta
+        self.nlta = lta
+        self.on_ratio = on_ratio
+        self.off_ratio = off_ratio
+        self.min_lta = min_lta
+        self._sta_window = array('d', bytes(8 * sta))
+        self._lta_window = array('d', bytes(8 * lta))
+        self.reset()
+
+    @property
+    def mean(self):
+        return self.baseline.mean
+
+    def reset(self):
+        self.triggered = False
+        self.ratio = 0.0
+        self.baseline.unfreeze()
+        for i in range(self.nsta):
+            self._sta_window[i] = 0.0
+        for i in range(self.nlta):
+            self._lta_window[i] = 0.0
+        self._sta_index = 0
+        self._lta_index = 0
+        self._sta_sum = 0.0
+        self._lta_sum = 0.0
+        self._count = 0
+
+    def update(self, value):
+        cf = (value - self.baseline.mean) ** 2
+        i = self._sta_index
+        self._sta_sum += cf - self._sta_window[i]
+        self._sta_window[i] = cf
+        if i + 1 < self.nsta:
+            self._sta_index = i + 1
+        else:
+            self._sta_index = 0
+            self._sta_sum = sum(self._sta_window) # once a lap, so rounding can't pile up
+        if not self.triggered:
+            i = self._lta_index
+            self._lta_sum += cf - self._lta_window[i]
+            self._lta_window[i] = cf
+            if i + 1 < self.nlta:
+                self._lta_index = i + 1
+            else:
+                self._lta_index = 0
+                self._lta_sum = sum(self._lta_window)
+            if self._count < self.nlta:
+                self._count += 1
+                self.baseline.update(value)
+                return False
+        lta = self._lta_sum / self.nlta
+        if lta < self.min_lta:
+            lta = self.min_lta
+        self.ratio = (self._sta_sum / self.nsta) / lta
+        if self.triggered:
+            if self.ratio < self.off_ratio:
+                self.triggered = False
+                self.baseline.unfreeze()
+        elif self.ratio > self.on_ratio:
+            self.triggered = True
+            self.baseline.freeze()
+        else:
+            self.baseline.update(value)
+        return self.triggered
+
+class AnyChannelTrigger(object):
+    """
+    One trigger per channel, the event is on while any of them is.
+    Every channel's baseline is frozen for the whole event, not just the
+    ones that went off, so the quiet axes keep the zero they had before it.
+    """
+    __slots__ = ("triggers", "triggered")
+
+    def __init__(self, triggers):
+        self.triggers = list(triggers)
+        self.triggered = False
+
+    @property
+    def mean(self):
+        return tuple(t.baseline.mean for t in self.triggers)
+
+    @property
+    def active_tolerance(self):
+        # per channel, for threshold triggers
+        return tuple(t.active_tolerance for t in self.triggers)
+
+    def reset(self):
+        self.triggered = False
+        for t in self.triggers:
+            t.reset()
+
+    def update(self, values):
+        on = False
+        for t, value in zip(self.triggers, values):
+            if t.update(value):
+                on = True
+        if on:
+            for t in self.triggers:
+                t.baseline.freeze()
+        elif self.triggered:
+            for t in self.triggers:
+                t.baseline.unfreeze()
+        self.triggered = on
+        return on
+
+class MagnitudeTrigger(object):
+    """
+    Triggers on the length of the vector of readings, each taken off its
+    own channel's baseline, so shaking that's split across axes counts in
+    full. trigger is any single channel trigger, fed the magnitude; it
+    owns the baseline for the magnitude itself, which needs starting off
+    like the channel ones (see acquisition.loop.establish_baseline) or a
+    threshold in sigmas goes off on the first reading. The channel
+    baselines are kept here and frozen during events.
+    """
+    __slots__ = ("baselines", "trigger", "triggered")
+
+    def __init__(self, baselines, trigger):
+        self.baselines = list(baselines)
+        self.trigger = trigger
+        self.triggered = False
+
+    @property
+    def mean(self):
+        return tuple(b.mean for b in self.baselines)
+
+    @property
+    def active_tolerance(self):
+        # of the magnitude, for a threshold trigger
+        return self.trigger.active_tolerance
+
+    def reset(self):
+        self.triggered = False
+        self.trigger.reset()
+        for b in self.baselines:
+            b.unfreeze()
+
+    def update(self, values):
+        on = self.trigger.update(magnitude(self.baselines, values))
+        if on:
+            for b in self.baselines:
+                b.freeze()
+        else:
+            for b, value in zip(self.baselines, values):
+                b.unfreeze()
+                b.update(value)
+        self.triggered = on
+        return on
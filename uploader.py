@@ -0,0 +1,278 @@
+"""
+Sends results to the website without holding anything up.
+post() only writes the result to a spool directory and returns; a
+background thread sends what's spooled in batches and deletes it once
+the server has it.
+    - Every result is its own small JSON file, written to .part and
+      renamed, so a crash or a reboot loses nothing: whatever is still in
+      the spool is sent by the next Uploader on the same directory.
+    - Each endpoint spools to its own subdirectory, named after a hash of
+      its URL (which is written in the subdirectory's "endpoint" file), so
+      results only ever go where they were posted to, and uploaders to
+      different endpoints can share a spool directory.
+    - A batch is one POST of a JSON list, over one HTTP/1.1 connection
+      that is kept open between batches and reopened after an error.
+    - Network errors, 5xx, 408 and 429 are retried with exponential
+      backoff (with jitter, so a fleet doesn't retry in step). Any other
+      4xx means the server will never take that batch, so its files are
+      moved to <spool>/<endpoint>/failed instead of blocking everything
+      behind them.
+"""
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+
+SPOOL_DIR = "spool"
+FAILED_DIR = "failed"
+ENDPOINT_FILE = "endpoint"
+RETRY_STATUS = (408, 429)
+
+def endpoint_spool(spool_dir, endpoint):
+    """
+    The subdirectory of spool_dir that results for endpoint are spooled in.
+    """
+    return os.path.join(spool_dir, hashlib.sha1(endpoint.encode("utf-8")).hexdigest()[:16])
+
+class Uploader(object):
+    """
+    Background uploader to one endpoint (an http:// or https:// URL).
+        - batch_size is the most results sent in one POST.
+        - min_backoff and max_backoff (seconds) bound the wait after a
+          failed batch, doubling from one failure to the next.
+        - close(timeout) sends what it can in timeout seconds and leaves
+          the rest spooled.
+    """
+
+    def __init__(self, endpoint, spool_dir=SPOOL_DIR, batch_size=50, timeout=10.0, min_backoff=0.5, max_backoff=60.0):
+        url = urllib.parse.urlsplit(endpoint)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError("Need an http:// or https:// endpoint, got " + repr(endpoint))
+        self.endpoint = endpoint
+        self._url = url
+        self.spool_dir = endpoint_spool(spool_dir, endpoint)
+        self.failed_dir = os.path.join(self.spool_dir, FAILED_DIR)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        for d in (self.spool_dir, self.failed_dir):
+            if not os.path.isdir(d):
+                os.makedirs(d)
+        endpoint_file = os.path.join(self.spool_dir, ENDPOINT_FILE)
+        if not os.path.exists(endpoint_file): # which URL this is, for people looking at the spool
+            with open(endpoint_file, "w") as f:
+                f.write(endpoint + "\n")
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event() # something was spooled
+        self._stop = threading.Event() # close() was called, cuts a backoff short
+        self._closing = False
+        self._seq = 0
+        self.depth = len(self._pending()) # left over from an earlier run
+        self.max_depth = self.depth
+        self.sent = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self.send_time = 0.0 # seconds spent in POSTs that went through
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="uploader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    # ~~~~~~~ Spool ~~~~~~~~~~~~~
+
+    def post(self, data):
+        """
+        Spools data (anything json can encode) to be sent. Returns the spool file name.
+        """
+        body = json.dumps(data, default=float) # numpy numbers included
+        with self._lock:
+            self._seq += 1
+            name = "%020d_%06d.json" % (time.time_ns(), self._seq)
+        fname = os.path.join(self.spool_dir, name)
+        with open(fname + ".part", "w") as f:
+            f.write(body)
+        os.replace(fname + ".part", fname)
+        with self._lock:
+            self.depth += 1
+            if self.depth > self.max_depth:
+                self.max_depth = self.depth
+        self._wake.set()
+        return fname
+
+    def _pending(self):
+        # oldest first, the names start with the time they were spooled
+        return sorted(f for f in os.listdir(self.spool_dir) if f.endswith(".json"))
+
+    def _done(self, names, failed=False):
+        for name in names:
+            fname = os.path.join(self.spool_dir, name)
+            try:
+                if failed:
+                    os.replace(fname, os.path.join(self.failed_dir, name))
+                else:
+                    os.remove(fname)
+            except OSError: # already gone, another uploader on this spool dealt with it
+                pass
+        with self._lock:
+            self.depth -= len(names)
+
+    # ~~~~~~~ Sending ~~~~~~~~~~~~~
+
+    def _connect(self):
+        if self._conn is None:
+            conn_class = http.client.HTTPSConnection if self._url.scheme == "https" else http.client.HTTPConnection
+            self._conn = conn_class(self._url.hostname, self._url.port, timeout=self.timeout)
+            self.connections += 1
+        return self._conn
+
+    def _disconnect(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _send(self, body):
+        """
+        POSTs one batch. Returns the HTTP status, raises on network errors.
+        """
+        path = self._url.path or "/"
+        if self._url.query:
+            path += "?" + self._url.query
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        reused = self._conn is not None
+        conn = self._connect()
+        try:
+            conn.request("POST", path, body, headers)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException):
+            if not reused:
+                raise
+            # the server may have dropped the idle connection, that's not a failure yet
+            self._disconnect()
+            conn = self._connect()
+            conn.request("POST", path, body, headers)
+            response = conn.getresponse()
+        response.read() # has to be drained before the connection can be reused
+        if response.will_close:
+            self._disconnect()
+        return response.status
+
+    def _send_batch(self, names):
+        """
+        Sends the spooled files in names. Returns True if they're dealt
+        with (sent, or given up on), False to retry later.
+        """
+        records = []
+        readable = []
+        for name in names:
+            try:
+                with open(os.path.join(self.spool_dir, name)) as f:
+                    records.append(json.load(f))
+                readable.append(name)
+            except ValueError: # half written by something else, never going to parse
+                self._done([name], failed=True)
+                self.failed += 1
+            except OSError: # another uploader on this spool sent it first
+                pass
+        if not records:
+            return True
+        body = json.dumps(records).encode("utf-8")
+        start = time.perf_counter()
+        try:
+            status = self._send(body)
+        except (OSError, http.client.HTTPException) as e:
+            self._disconnect()
+            self.last_error = repr(e)
+            return False
+        if 200 <= status < 300:
+            self.send_time += time.perf_counter() - start
+            self._done(readable)
+            self.sent += len(readable)
+            self.batches += 1
+            self.bytes_sent += len(body)
+            return True
+        self.last_error = "HTTP " + str(status)
+        if status >= 500 or status in RETRY_STATUS:
+            return False
+        self._done(readable, failed=True)
+        self.failed += len(readable)
+        return True
+
+    def _run(self):
+        backoff = self.min_backoff
+        while True:
+            try:
+                names = self._pending()
+            except OSError as e: # the spool directory went away, retry like a failed batch
+                self.last_error = repr(e)
+                names = None
+            else:
+                with self._lock: # recount, another uploader on this spool may have sent some
+                    self.depth = len(names)
+                names = names[:self.batch_size]
+            if names == []:
+                if self._closing:
+                    break
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if names and self._send_batch(names):
+                backoff = self.min_backoff
+                continue
+            if self._closing:
+                break # the rest stays spooled for next time
+            self.retries += 1
+            # full jitter: anywhere up to the current backoff. New posts don't
+            # cut it short, or a busy spool would hammer a server that's down
+            self._stop.wait(random.uniform(0, backoff))
+            backoff = min(backoff * 2, self.max_backoff)
+        self._disconnect()
+
+    def flush(self, timeout=None):
+        """
+        Waits until the spool is empty, at most timeout seconds. Returns
+        whether it is.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.depth > 0 and self._thread.is_alive():
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+        return self.depth == 0
+
+    def close(self, timeout=None):
+        self._closing = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    # ~~~~~~~ Metrics ~~~~~~~~~~~~~
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "connections": self.connections,
+            "bytes_sent": self.bytes_sent,
+            "results_per_second": self.sent / self.send_time if self.send_time else 0.0,
+            "last_error": self.last_error,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("  Results sent    : "+str(stats["sent"])+" in "+str(stats["batches"])+" batches over "+str(stats["connections"])+" connections")
+        print("  Still spooled   : "+str(stats["depth"])+" (max "+str(stats["max_depth"])+"), "+str(stats["failed"])+" rejected to "+self.failed_dir)
+        print("  Retries         : "+str(stats["retries"])+(" (last error "+stats["last_error"]+")" if stats["last_error"] else ""))
+        print("  Send rate       : "+str(stats["results_per_second"])+" results/second")